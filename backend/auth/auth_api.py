@@ -1,55 +1,90 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel, Field, EmailStr
+import asyncio
 import sqlite3
 import os
 import secrets
 from datetime import datetime, timedelta
-from typing import Optional
 
 # Import database functions
-from auth.db_setup import hash_password, DB_PATH
+from auth.db_setup import DB_PATH
+from auth.db_pool import ConnectionPool
+from auth.models import Token, UserCreate, UserLogin
+from auth.password_hashing import HashingBusyError, HashingPool, hash_password, verify_password
+from auth.user_cache import UserCache
+from auth.token_store import RevocationSet, TokenCache, create_token_store
+from auth.signed_tokens import (
+    claims_expiry, claims_user, create_signed_token, decode_signed_token, is_signed_token
+)
+import jwt
 
 # Setup authentication
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Simple token store (in production, use Redis or a database)
+# Issued tokens live in a store shared by all workers, selected with AUTH_TOKEN_STORE
+# ("sqlite" by default, "redis" or "memory"), behind an in-process read-through cache.
 # Format: {"token": {"username": username, "role": role, "expires": datetime}}
-active_tokens = {}
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_TOKEN_CACHE_TTL = float(os.environ.get("AUTH_TOKEN_CACHE_TTL", "5"))
 
-# Input validation models
-class UserBase(BaseModel):
-    username: str = Field(..., min_length=3, max_length=50)
+# Caps on stored tokens (0 disables a cap); the oldest tokens are evicted first
+AUTH_MAX_TOKENS_PER_USER = int(os.environ.get("AUTH_MAX_TOKENS_PER_USER", "10"))
+AUTH_MAX_TOKENS = int(os.environ.get("AUTH_MAX_TOKENS", "100000"))
 
-class UserCreate(UserBase):
-    password: str = Field(..., min_length=6)
-    role: str = Field(..., pattern='^(farmer|consumer)$')
-    name: Optional[str] = None
-    email: Optional[EmailStr] = None
+# Seconds between sweeps of expired tokens (0 disables the sweeper)
+AUTH_TOKEN_SWEEP_INTERVAL = float(os.environ.get("AUTH_TOKEN_SWEEP_INTERVAL", "60"))
 
-class UserLogin(BaseModel):
-    username: str
-    password: str
+# Seconds between reads of the token store's change log, which drop cached
+# tokens that other workers changed (logouts, evictions); 0 disables them
+AUTH_TOKEN_REFRESH_INTERVAL = float(os.environ.get("AUTH_TOKEN_REFRESH_INTERVAL", "1"))
 
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-    role: str
-    username: str
+# Kind of token issued at login: "opaque" random tokens kept in the token store, or
+# "signed" HMAC-signed tokens that are verified without any store or users.db lookup.
+# Both kinds are accepted whatever the mode, so switching modes logs nobody out.
+AUTH_TOKEN_MODE = os.environ.get("AUTH_TOKEN_MODE", "opaque")
 
-def get_user(username: str):
+active_tokens = TokenCache(
+    create_token_store(max_tokens_per_user=AUTH_MAX_TOKENS_PER_USER, max_tokens=AUTH_MAX_TOKENS),
+    AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL
+)
+
+# Ids of logged-out signed tokens, kept until the tokens expire. Every worker
+# holds all of them in memory, so checking a signed token needs no store I/O.
+revoked_tokens = RevocationSet(create_token_store(namespace="revoked_tokens"))
+token_sweeper = None
+token_refresher = None
+
+# Reused connections to users.db (WAL mode, prepared statement cache)
+AUTH_DB_POOL_SIZE = int(os.environ.get("AUTH_DB_POOL_SIZE", "4"))
+AUTH_DB_POOL_TIMEOUT = float(os.environ.get("AUTH_DB_POOL_TIMEOUT", "5"))
+auth_db = ConnectionPool(DB_PATH, AUTH_DB_POOL_SIZE, AUTH_DB_POOL_TIMEOUT)
+
+# Recently read user rows (0 entries disables the cache); unknown usernames are
+# cached for the shorter negative TTL
+AUTH_USER_CACHE_SIZE = int(os.environ.get("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL = float(os.environ.get("AUTH_USER_CACHE_TTL", "30"))
+AUTH_USER_NEGATIVE_TTL = float(os.environ.get("AUTH_USER_NEGATIVE_TTL", "5"))
+user_cache = UserCache(AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL, AUTH_USER_NEGATIVE_TTL)
+
+# Password hashing runs on a bounded thread pool off the event loop; when more than
+# AUTH_HASH_QUEUE hashes are already waiting, logins get a 503 with Retry-After
+AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+AUTH_HASH_QUEUE = int(os.environ.get("AUTH_HASH_QUEUE", "32"))
+AUTH_RETRY_AFTER = int(os.environ.get("AUTH_RETRY_AFTER", "1"))
+hashing_pool = HashingPool(AUTH_HASH_WORKERS, AUTH_HASH_QUEUE)
+
+async def get_user(username: str):
+    """Get a user by username, from the user cache or the database (read in a thread)"""
+    return await user_cache.fetch(username, load_user)
+
+def load_user(username: str):
     """Get a user from the database by username"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT id, username, password_hash, role, name, email FROM users WHERE username = ?",
-        (username,)
-    )
-    
-    user = cursor.fetchone()
-    conn.close()
+    with auth_db.connection() as conn:
+        user = conn.execute(
+            "SELECT id, username, password_hash, role, name, email FROM users WHERE username = ?",
+            (username,)
+        ).fetchone()
     
     if user:
         return {
@@ -62,28 +97,135 @@ def get_user(username: str):
         }
     return None
 
-def authenticate_user(username: str, password: str):
+async def authenticate_user(username: str, password: str):
     """Authenticate a user by username and password"""
-    user = get_user(username)
+    user = await get_user(username)
     if not user:
         return False
     
     # Verify password
-    password_hash = hash_password(password)
-    
-    if password_hash != user["password_hash"]:
+    matches, needs_rehash = await hashing_pool.run(verify_password, password, user["password_hash"])
+    if not matches:
         return False
     
+    # Upgrade legacy SHA-256 (or outdated KDF) hashes now that we know the password
+    if needs_rehash:
+        await upgrade_password_hash(user, password)
+    
     return user
 
+def insert_user(user: UserCreate, password_hash: str):
+    """Insert a new user row and return its id"""
+    with auth_db.connection() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO users (username, password_hash, role, name, email)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                user.username,
+                password_hash,
+                user.role,
+                user.name,
+                user.email
+            )
+        )
+        return cursor.lastrowid
+
+def save_password_hash(user_id: int, password_hash: str):
+    with auth_db.connection() as conn:
+        conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id))
+
+async def upgrade_password_hash(user, password: str):
+    """
+    Re-hash a verified password with the current KDF and store it.
+    
+    Best effort: the login has already succeeded, so when the hashing queue is
+    full the upgrade is skipped and tried again on the user's next login.
+    """
+    try:
+        password_hash = await hashing_pool.run(hash_password, password)
+    except HashingBusyError:
+        return
+    try:
+        await asyncio.to_thread(save_password_hash, user["id"], password_hash)
+    except Exception as e:
+        print(f"Password hash upgrade failed for user {user['id']}: {e}")
+        return
+    user_cache.invalidate(user["username"])
+
+def hashing_busy_error(error: HashingBusyError) -> HTTPException:
+    """503 telling the client to back off while the hashing queue is full"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Authentication service busy: {str(error)}",
+        headers={"Retry-After": str(AUTH_RETRY_AFTER)}
+    )
+
 def create_access_token():
     """Create a simple random token"""
     return secrets.token_hex(32)
 
+async def issue_access_token(user):
+    """Create a token for a user row: signed, or random and saved in the token store"""
+    expires = datetime.utcnow() + timedelta(days=1)
+    if AUTH_TOKEN_MODE == "signed":
+        return create_signed_token(user, expires)
+    access_token = create_access_token()
+    await asyncio.to_thread(active_tokens.put, access_token, {
+        "username": user["username"],
+        "role": user["role"],
+        "expires": expires
+    })
+    return access_token
+
+def unauthorized(detail: str):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def sweep_expired_tokens():
+    """Periodically delete expired tokens so abandoned sessions do not pile up"""
+    while True:
+        await asyncio.sleep(AUTH_TOKEN_SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(active_tokens.store.sweep)
+            await asyncio.to_thread(revoked_tokens.store.sweep)
+        except Exception as e:
+            print(f"Token sweep failed: {e}")
+
+async def refresh_token_caches():
+    """Periodically apply token changes made by other workers to this worker's caches"""
+    while True:
+        await asyncio.sleep(AUTH_TOKEN_REFRESH_INTERVAL)
+        try:
+            await asyncio.to_thread(active_tokens.refresh)
+            await asyncio.to_thread(revoked_tokens.refresh)
+        except Exception as e:
+            print(f"Token cache refresh failed: {e}")
+
+@router.on_event("startup")
+async def start_token_sweeper():
+    global token_sweeper, token_refresher
+    if AUTH_TOKEN_SWEEP_INTERVAL > 0:
+        token_sweeper = asyncio.create_task(sweep_expired_tokens())
+    if AUTH_TOKEN_REFRESH_INTERVAL > 0:
+        token_refresher = asyncio.create_task(refresh_token_caches())
+
+@router.on_event("shutdown")
+async def stop_token_sweeper():
+    for task in (token_sweeper, token_refresher):
+        if task is not None:
+            task.cancel()
+    hashing_pool.shutdown()
+    auth_db.close()
+
 @router.post("/register", response_model=Token)
 async def register_user(user: UserCreate):
     # Check if username already exists
-    existing_user = get_user(user.username)
+    existing_user = await get_user(user.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -91,58 +233,52 @@ async def register_user(user: UserCreate):
         )
     
     # Hash the password
-    password_hash = hash_password(user.password)
-    
-    # Connect to the database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    try:
+        password_hash = await hashing_pool.run(hash_password, user.password)
+    except HashingBusyError as e:
+        raise hashing_busy_error(e)
     
     try:
         # Insert the new user
-        cursor.execute(
-            """
-            INSERT INTO users (username, password_hash, role, name, email)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (
-                user.username,
-                password_hash,
-                user.role,
-                user.name,
-                user.email
-            )
-        )
-        conn.commit()
-        
-        # Create access token
-        access_token = create_access_token()
-        expires = datetime.utcnow() + timedelta(days=1)
-        active_tokens[access_token] = {
-            "username": user.username, 
-            "role": user.role, 
-            "expires": expires
-        }
-        
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "role": user.role,
-            "username": user.username
-        }
-        
+        user_id = await asyncio.to_thread(insert_user, user, password_hash)
     except Exception as e:
-        conn.rollback()
+        if isinstance(e, sqlite3.IntegrityError) and e.sqlite_errorname == "SQLITE_CONSTRAINT_UNIQUE":
+            # Another request registered the same username since the check above
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Username already registered"
+            )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to register user: {str(e)}"
         )
     finally:
-        conn.close()
+        # Drop the cached "no such user" entry left by the duplicate check
+        user_cache.invalidate(user.username)
+    
+    # Create access token
+    access_token = await issue_access_token({
+        "id": user_id,
+        "username": user.username,
+        "role": user.role,
+        "name": user.name,
+        "email": user.email
+    })
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "role": user.role,
+        "username": user.username
+    }
 
 @router.post("/login", response_model=Token)
 async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
     # Authenticate the user
-    authenticated_user = authenticate_user(form_data.username, form_data.password)
+    try:
+        authenticated_user = await authenticate_user(form_data.username, form_data.password)
+    except HashingBusyError as e:
+        raise hashing_busy_error(e)
     if not authenticated_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -151,13 +287,7 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
         )
     
     # Create access token
-    access_token = create_access_token()
-    expires = datetime.utcnow() + timedelta(days=1)
-    active_tokens[access_token] = {
-        "username": authenticated_user["username"], 
-        "role": authenticated_user["role"], 
-        "expires": expires
-    }
+    access_token = await issue_access_token(authenticated_user)
     
     return {
         "access_token": access_token,
@@ -170,7 +300,10 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
 @router.post("/login/user", response_model=Token)
 async def login_user_json(user: UserLogin):
     # Authenticate the user
-    authenticated_user = authenticate_user(user.username, user.password)
+    try:
+        authenticated_user = await authenticate_user(user.username, user.password)
+    except HashingBusyError as e:
+        raise hashing_busy_error(e)
     if not authenticated_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -179,13 +312,7 @@ async def login_user_json(user: UserLogin):
         )
     
     # Create access token
-    access_token = create_access_token()
-    expires = datetime.utcnow() + timedelta(days=1)
-    active_tokens[access_token] = {
-        "username": authenticated_user["username"], 
-        "role": authenticated_user["role"], 
-        "expires": expires
-    }
+    access_token = await issue_access_token(authenticated_user)
     
     return {
         "access_token": access_token,
@@ -195,8 +322,21 @@ async def login_user_json(user: UserLogin):
     }
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    # Signed tokens carry the user, so they are checked without any database I/O
+    if is_signed_token(token):
+        try:
+            claims = decode_signed_token(token)
+        except jwt.ExpiredSignatureError:
+            raise unauthorized("Token expired")
+        except jwt.InvalidTokenError:
+            raise unauthorized("Invalid or expired token")
+        if revoked_tokens.is_revoked(claims["jti"]):
+            raise unauthorized("Invalid or expired token")
+        return claims_user(claims)
+    
     # Check if token exists and is valid
-    if token not in active_tokens:
+    token_data = await active_tokens.fetch(token)
+    if token_data is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
@@ -204,9 +344,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         )
     
     # Check if token is expired
-    token_data = active_tokens[token]
     if token_data["expires"] < datetime.utcnow():
-        del active_tokens[token]
+        await asyncio.to_thread(active_tokens.delete, token)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token expired",
@@ -214,7 +353,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         )
     
     # Get user from database to ensure it still exists
-    user = get_user(token_data["username"])
+    user = await get_user(token_data["username"])
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -235,8 +374,33 @@ async def read_users_me(current_user = Depends(get_current_user)):
         "email": current_user["email"]
     }
 
+# Token store and cache statistics
+@router.get("/stats")
+async def auth_stats():
+    return {
+        "mode": AUTH_TOKEN_MODE,
+        "tokens": await asyncio.to_thread(active_tokens.store.stats),
+        "token_cache": active_tokens.stats(),
+        "revoked_tokens": {**await asyncio.to_thread(revoked_tokens.store.stats), **revoked_tokens.stats()},
+        "db_pool": auth_db.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hashing": hashing_pool.stats()
+    }
+
 @router.post("/logout")
 async def logout(token: str = Depends(oauth2_scheme)):
-    if token in active_tokens:
-        del active_tokens[token]
+    if is_signed_token(token):
+        # Revoke the token id until the token would have expired anyway
+        try:
+            claims = decode_signed_token(token, verify_exp=False)
+        except jwt.InvalidTokenError:
+            claims = None
+        if claims is not None and claims_expiry(claims) > datetime.utcnow():
+            await asyncio.to_thread(revoked_tokens.revoke, claims["jti"], {
+                "username": claims["sub"],
+                "role": claims["role"],
+                "expires": claims_expiry(claims)
+            })
+    else:
+        await asyncio.to_thread(active_tokens.delete, token)
     return {"message": "Successfully logged out"} 
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Bulk import of users into users.db from CSV or NDJSON.
+
+Used to onboard farmer cooperatives with many members at once. The input is
+streamed in batches: passwords of each batch are hashed in parallel worker
+processes (the KDF is CPU-bound) while the previous batch is inserted, and
+every batch is written with one executemany in a single transaction.
+Usernames that already exist, or repeat within the file, are skipped (ON
+CONFLICT(username) DO NOTHING) and reported instead of aborting the import.
+Rows that break any other constraint are reported as failed.
+
+Input fields: username, password, role (farmer or consumer), and optionally
+name and email. CSV files need a header row.
+
+Usage: python auth/bulk_import.py members.csv [--batch-size 5000] [--workers 4]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pydantic import ValidationError
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.db_pool import CONNECTION_PRAGMAS
+from auth.db_setup import DB_PATH, create_tables
+from auth.models import UserCreate
+from auth.password_hashing import hash_password
+from utils.request_rows import format_validation_error
+
+# Largest number of host parameters used in one IN (...) query
+SQL_VARIABLES = 900
+
+# Number of problem rows listed in the report
+REPORT_EXAMPLES = 20
+
+INSERT_USER = (
+    "INSERT INTO users (username, password_hash, role, name, email) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(username) DO NOTHING"
+)
+
+
+def read_rows(path, fmt):
+    """Yield (line number, row dict) from a CSV or NDJSON file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_number, ValueError(f"Invalid JSON: {e.msg}")
+
+
+def validate_row(row):
+    """Return the cleaned user fields, or raise ValueError (same rules as /auth/register)"""
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("row must be a JSON object")
+    fields = {field: row.get(field) for field in ("username", "password", "role", "name", "email")}
+    # CSV has no null; an empty optional column means the field was not given
+    for field in ("name", "email"):
+        if fields[field] == "":
+            fields[field] = None
+    try:
+        user = UserCreate(**fields)
+    except ValidationError as e:
+        raise ValueError(format_validation_error(e))
+    return user.username, user.password, user.role, user.name, user.email
+
+
+def batches(rows, batch_size):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def existing_usernames(conn, usernames):
+    found = set()
+    for i in range(0, len(usernames), SQL_VARIABLES):
+        chunk = usernames[i:i + SQL_VARIABLES]
+        found.update(row[0] for row in conn.execute(
+            f"SELECT username FROM users WHERE username IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    return found
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.failed = 0
+        self.duplicate_examples = []
+        self.invalid_examples = []
+        self.failed_examples = []
+        self.hash_wait_seconds = 0.0
+        self.insert_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def duplicate(self, line_number, username):
+        self.duplicates += 1
+        if len(self.duplicate_examples) < REPORT_EXAMPLES:
+            self.duplicate_examples.append(f"line {line_number}: {username}")
+
+    def invalid_row(self, line_number, error):
+        self.invalid += 1
+        if len(self.invalid_examples) < REPORT_EXAMPLES:
+            self.invalid_examples.append(f"line {line_number}: {error}")
+
+    def failed_row(self, line_number, error):
+        self.failed += 1
+        if len(self.failed_examples) < REPORT_EXAMPLES:
+            self.failed_examples.append(f"line {line_number}: {error}")
+
+    def summary(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            "read": self.read,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "failed": self.failed,
+            "seconds": round(seconds, 2),
+            "rows_per_second": round(self.read / seconds, 1) if seconds else 0.0,
+            "hash_wait_seconds": round(self.hash_wait_seconds, 2),
+            "insert_seconds": round(self.insert_seconds, 2),
+            "duplicate_examples": self.duplicate_examples,
+            "invalid_examples": self.invalid_examples,
+            "failed_examples": self.failed_examples
+        }
+
+
+def import_users(path, fmt=None, db_path=DB_PATH, batch_size=5000, workers=None, progress=True):
+    """Import users from a CSV or NDJSON file and return the import report"""
+    fmt = fmt or ("ndjson" if os.path.splitext(path)[1].lower() in (".ndjson", ".jsonl") else "csv")
+    report = ImportReport()
+    seen = set()
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+    def prepare(batch):
+        """Validate a batch and drop duplicates; returns (line numbers, user fields)"""
+        accepted = []
+        for line_number, row in batch:
+            report.read += 1
+            try:
+                user = validate_row(row)
+            except ValueError as e:
+                report.invalid_row(line_number, e)
+                continue
+            if user[0] in seen:
+                report.duplicate(line_number, user[0])
+                continue
+            seen.add(user[0])
+            accepted.append((line_number, user))
+        existing = existing_usernames(conn, [user[0] for _, user in accepted])
+        for line_number, user in accepted:
+            if user[0] in existing:
+                report.duplicate(line_number, user[0])
+        return [(line_number, user) for line_number, user in accepted if user[0] not in existing]
+
+    def insert(users, password_hashes):
+        start = time.perf_counter()
+        rows = [(username, password_hash, role, name, email)
+                for (_, (username, _, role, name, email)), password_hash in zip(users, password_hashes)]
+        failed = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.execute("SAVEPOINT batch")
+            try:
+                conn.executemany(INSERT_USER, rows)
+                inserted = conn.total_changes - before
+            except sqlite3.IntegrityError:
+                # A row breaks a constraint other than the unique username:
+                # insert the batch row by row and report the rows that fail
+                conn.execute("ROLLBACK TO batch")
+                inserted = 0
+                for (line_number, _), row in zip(users, rows):
+                    try:
+                        inserted += conn.execute(INSERT_USER, row).rowcount
+                    except sqlite3.IntegrityError as e:
+                        report.failed_row(line_number, e)
+                        failed += 1
+            conn.execute("RELEASE batch")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        # Rows skipped here were inserted by someone else after the duplicate check
+        report.inserted += inserted
+        report.duplicates += len(users) - inserted - failed
+        report.insert_seconds += time.perf_counter() - start
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, batch_size // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = None
+        for batch in batches(read_rows(path, fmt), batch_size):
+            users = prepare(batch)
+            # Hash this batch in the workers while the previous one is inserted
+            hashes = executor.map(hash_password, [user[1] for _, user in users], chunksize=chunksize)
+            if pending is not None:
+                insert(*pending)
+            hash_start = time.perf_counter()
+            pending = (users, list(hashes))
+            report.hash_wait_seconds += time.perf_counter() - hash_start
+            if progress:
+                summary = report.summary()
+                print(f"{summary['read']} rows read, {report.inserted} inserted, "
+                      f"{summary['rows_per_second']:.0f} rows/sec", flush=True)
+        if pending is not None:
+            insert(*pending)
+
+    conn.close()
+    return report.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users into users.db from CSV or NDJSON")
+    parser.add_argument("path", help="CSV (with header) or NDJSON file of users")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="Input format (default: from the file extension)")
+    parser.add_argument("--db", default=str(DB_PATH), help="Users database (default: auth/data/users.db)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per transaction")
+    parser.add_argument("--workers", type=int, default=None, help="Password hashing processes (default: all cores)")
+    args = parser.parse_args()
+
+    create_tables(args.db)
+    print(json.dumps(import_users(args.path, args.format, args.db, args.batch_size, args.workers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
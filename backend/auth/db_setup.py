@@ -1,5 +1,4 @@
 import sqlite3
-import os
 import hashlib
 from pathlib import Path
 
@@ -11,13 +10,14 @@ def hash_password(password):
     """Simple password hashing using SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
-def create_tables():
-    """Create the users table if it doesn't exist"""
+def create_tables(db_path=None):
+    """Create the users table if it doesn't exist (in users.db unless db_path is given)"""
+    db_path = db_path or DB_PATH
     # Make sure the data directory exists
-    DB_DIR.mkdir(exist_ok=True)
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
     
     # Connect to SQLite database
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     # Create users table with simpler structure
@@ -37,7 +37,7 @@ def create_tables():
     conn.commit()
     conn.close()
     
-    print(f"Database setup completed at {DB_PATH}")
+    print(f"Database setup completed at {db_path}")
 
 def add_test_users():
     """Add test users to the database"""
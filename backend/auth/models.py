@@ -0,0 +1,30 @@
+"""
+Request and response models of the auth API.
+
+Kept apart from auth_api so that tools such as bulk_import can validate
+users with exactly the rules of /auth/register without starting the API's
+token stores and connection pools.
+"""
+
+from pydantic import BaseModel, Field, EmailStr
+from typing import Optional
+
+# Input validation models
+class UserBase(BaseModel):
+    username: str = Field(..., min_length=3, max_length=50)
+
+class UserCreate(UserBase):
+    password: str = Field(..., min_length=6)
+    role: str = Field(..., pattern='^(farmer|consumer)$')
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+
+class UserLogin(BaseModel):
+    username: str
+    password: str
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+    role: str
+    username: str
@@ -0,0 +1,150 @@
+"""
+Password hashing with a slow, salted key derivation function.
+
+Passwords used to be stored as a single unsalted SHA-256 (db_setup.hash_password).
+New hashes use scrypt or PBKDF2-SHA256 from hashlib, selected with
+AUTH_PASSWORD_KDF, and are stored with their parameters and salt:
+
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+
+verify_password() also accepts legacy SHA-256 hashes and reports when a stored
+hash should be replaced (legacy format or outdated parameters), so hashes are
+upgraded transparently at the next successful login.
+
+A KDF is deliberately expensive, so hashing must not run on the event loop.
+HashingPool runs it on a small thread pool (hashlib releases the GIL while
+deriving keys) with a bounded queue; when the queue is full new work is
+rejected with HashingBusyError instead of piling up latency.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# KDF used for new hashes: "scrypt" or "pbkdf2"
+AUTH_PASSWORD_KDF = os.environ.get("AUTH_PASSWORD_KDF", "scrypt")
+
+# scrypt cost parameters (n must be a power of two; memory used is 128 * n * r bytes)
+AUTH_SCRYPT_N = int(os.environ.get("AUTH_SCRYPT_N", "16384"))
+AUTH_SCRYPT_R = int(os.environ.get("AUTH_SCRYPT_R", "8"))
+AUTH_SCRYPT_P = int(os.environ.get("AUTH_SCRYPT_P", "1"))
+
+# PBKDF2-SHA256 iteration count
+AUTH_PBKDF2_ITERATIONS = int(os.environ.get("AUTH_PBKDF2_ITERATIONS", "600000"))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def hash_password(password, kdf=None):
+    """Hash a password with the configured KDF and a random salt"""
+    kdf = kdf or AUTH_PASSWORD_KDF
+    salt = secrets.token_bytes(SALT_BYTES)
+    if kdf == "scrypt":
+        key = hashlib.scrypt(
+            password.encode(), salt=salt, n=AUTH_SCRYPT_N, r=AUTH_SCRYPT_R, p=AUTH_SCRYPT_P,
+            maxmem=256 * AUTH_SCRYPT_N * AUTH_SCRYPT_R, dklen=KEY_BYTES
+        )
+        return f"scrypt${AUTH_SCRYPT_N}${AUTH_SCRYPT_R}${AUTH_SCRYPT_P}${salt.hex()}${key.hex()}"
+    if kdf == "pbkdf2":
+        key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, AUTH_PBKDF2_ITERATIONS, KEY_BYTES)
+        return f"pbkdf2_sha256${AUTH_PBKDF2_ITERATIONS}${salt.hex()}${key.hex()}"
+    raise ValueError(f"Unknown AUTH_PASSWORD_KDF: {kdf}")
+
+
+def verify_password(password, stored_hash):
+    """
+    Check a password against a stored hash.
+
+    Returns (matches, needs_rehash); needs_rehash is True when the password
+    matches but the hash is legacy SHA-256 or uses other KDF settings than
+    the current configuration.
+    """
+    parts = stored_hash.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            key = hashlib.scrypt(
+                password.encode(), salt=bytes.fromhex(parts[4]), n=n, r=r, p=p,
+                maxmem=256 * n * r, dklen=len(parts[5]) // 2
+            )
+            matches = hmac.compare_digest(key.hex(), parts[5])
+            current = AUTH_PASSWORD_KDF == "scrypt" and (n, r, p) == (AUTH_SCRYPT_N, AUTH_SCRYPT_R, AUTH_SCRYPT_P)
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            iterations = int(parts[1])
+            key = hashlib.pbkdf2_hmac(
+                "sha256", password.encode(), bytes.fromhex(parts[2]), iterations, len(parts[3]) // 2
+            )
+            matches = hmac.compare_digest(key.hex(), parts[3])
+            current = AUTH_PASSWORD_KDF == "pbkdf2" and iterations == AUTH_PBKDF2_ITERATIONS
+        else:
+            # Legacy unsalted SHA-256 from db_setup.hash_password
+            matches = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored_hash)
+            current = False
+    except (ValueError, OverflowError):
+        # A malformed stored hash (bad number, salt or KDF parameters) matches no password
+        return False, False
+    return matches, matches and not current
+
+
+class HashingBusyError(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+class HashingPool:
+    """
+    Bounded thread pool for password hashing.
+
+    With max_workers=0 hashing runs inline on the calling thread (the old
+    behaviour, kept for comparison in benchmarks).
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = (ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+                          if max_workers > 0 else None)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        self.submitted = 0
+        self.rejected = 0
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on a hashing thread, raising HashingBusyError if the queue is full"""
+        if self._executor is None:
+            return fn(*args)
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HashingBusyError(f"Password hashing queue is full ({self.max_queue} waiting)")
+            self._in_flight += 1
+            self.submitted += 1
+        # The slot is released when the hash finishes (or is cancelled before
+        # starting), not when the awaiting request goes away
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "kdf": AUTH_PASSWORD_KDF,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "submitted": self.submitted,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,107 @@
+"""
+Stateless signed access tokens.
+
+A signed token is an HS256 JWT carrying the user's id, username, role, name,
+email and expiry, so a request can be authorized by checking the signature
+without reading the token store or users.db. Logging out adds the token's id
+(jti) to a revocation list until the token would have expired anyway.
+
+The signing key comes from AUTH_SIGNING_KEY, or from a key file that is
+created with a random key on first use (AUTH_SIGNING_KEY_FILE, by default
+auth/data/signing.key). Every worker must use the same key, and keys shorter
+than 32 bytes are refused.
+"""
+
+import os
+import secrets
+from datetime import datetime
+from pathlib import Path
+
+import jwt
+
+from auth.token_store import epoch_seconds
+
+SIGNING_KEY_FILE = Path(__file__).parent / "data" / "signing.key"
+ALGORITHM = "HS256"
+
+# Shortest accepted key; HS256 keys should be at least as long as the hash
+MIN_KEY_BYTES = 32
+
+_signing_key = None
+
+
+def create_key_file(path):
+    """Write a random key to path unless it exists; the file appears complete or not at all"""
+    path.parent.mkdir(exist_ok=True)
+    staging = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    fd = os.open(staging, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+            f.flush()
+            os.fsync(f.fileno())
+        # link() fails if another worker created the file first; then its key is used
+        try:
+            os.link(staging, path)
+        except FileExistsError:
+            pass
+    finally:
+        os.unlink(staging)
+
+
+def signing_key():
+    """The HMAC key, read from the environment or the key file (created if missing)"""
+    global _signing_key
+    if _signing_key is None:
+        key = os.environ.get("AUTH_SIGNING_KEY")
+        if not key:
+            path = Path(os.environ.get("AUTH_SIGNING_KEY_FILE", SIGNING_KEY_FILE))
+            if not path.exists():
+                create_key_file(path)
+            key = path.read_text().strip()
+        if len(key.encode()) < MIN_KEY_BYTES:
+            raise ValueError(f"Signing key must be at least {MIN_KEY_BYTES} bytes long")
+        _signing_key = key
+    return _signing_key
+
+
+def is_signed_token(token):
+    """Signed tokens are JWTs (three dot-separated parts); opaque tokens are hex"""
+    return token.count(".") == 2
+
+
+def create_signed_token(user, expires):
+    """Sign a token for a user row that expires at the given naive UTC datetime"""
+    claims = {
+        "sub": user["username"],
+        "uid": user["id"],
+        "role": user["role"],
+        "name": user.get("name"),
+        "email": user.get("email"),
+        "jti": secrets.token_hex(16),
+        "exp": int(epoch_seconds(expires))
+    }
+    return jwt.encode(claims, signing_key(), algorithm=ALGORITHM)
+
+
+def decode_signed_token(token, verify_exp=True):
+    """Return the token's claims; raises jwt.InvalidTokenError if it is forged or expired"""
+    return jwt.decode(
+        token, signing_key(), algorithms=[ALGORITHM],
+        options={"require": ["exp", "sub", "jti"], "verify_exp": verify_exp}
+    )
+
+
+def claims_user(claims):
+    """The user dict get_current_user returns, rebuilt from token claims"""
+    return {
+        "id": claims["uid"],
+        "username": claims["sub"],
+        "role": claims["role"],
+        "name": claims.get("name"),
+        "email": claims.get("email")
+    }
+
+
+def claims_expiry(claims):
+    return datetime.utcfromtimestamp(claims["exp"])
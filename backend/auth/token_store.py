@@ -0,0 +1,683 @@
+"""
+Pluggable storage for issued access tokens.
+
+Tokens used to live in a module-level dict, so a token issued by one uvicorn
+worker was rejected by the others and every restart logged everyone out. The
+stores here share tokens between processes:
+
+- MemoryTokenStore: the old per-process dict (single worker, tests)
+- SQLiteTokenStore: a WAL-mode SQLite file shared by all workers on one host
+- RedisTokenStore: a Redis server through redis-py, shared by all hosts
+
+Token data is a dict {"username": ..., "role": ..., "expires": datetime}.
+Every store also keeps a short change log of the tokens written or deleted
+by any process. TokenCache keeps a read-through cache in front of the store
+and reads that log periodically to drop just the entries of changed tokens.
+
+Stores index tokens by expiry so sweep() can drop expired ones without
+scanning, and cap the number of tokens per user and in total. All tokens are
+issued with the same lifetime, so the earliest expiry is also the oldest
+token and that is the one evicted when a cap is exceeded.
+"""
+
+import asyncio
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Token database, next to users.db
+TOKEN_DB_PATH = Path(__file__).parent / "data" / "tokens.db"
+
+# Seconds that changes stay in a store's change log; a cache that has not read
+# the log for half that long starts over instead of applying the changes
+TOKEN_CHANGE_LOG_SECONDS = float(os.environ.get("AUTH_TOKEN_CHANGE_LOG_SECONDS", "600"))
+
+
+def encode_token_data(token_data):
+    return json.dumps({**token_data, "expires": token_data["expires"].isoformat()})
+
+
+def decode_token_data(raw):
+    token_data = json.loads(raw)
+    token_data["expires"] = datetime.fromisoformat(token_data["expires"])
+    return token_data
+
+
+def epoch_seconds(expires):
+    """Naive UTC datetime -> POSIX timestamp"""
+    return expires.replace(tzinfo=timezone.utc).timestamp()
+
+
+def as_text(value):
+    """Redis replies are bytes unless the client decodes them"""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class TokenStore:
+    """
+    Interface shared by the token stores.
+
+    max_tokens_per_user and max_tokens cap the number of stored tokens
+    (0 means unlimited); put() evicts the oldest tokens over either cap.
+    """
+
+    name = "base"
+
+    def __init__(self, max_tokens_per_user=0, max_tokens=0):
+        self.max_tokens_per_user = max_tokens_per_user
+        self.max_tokens = max_tokens
+        self.evicted_per_user = 0
+        self.evicted_total = 0
+        self.sweeps = 0
+        self.swept = 0
+        self.last_sweep_ms = 0.0
+
+    def put(self, token, token_data):
+        """Store a token and return the tokens evicted to stay within the caps"""
+        raise NotImplementedError
+
+    def get(self, token):
+        """Return the token data, or None if the token is unknown"""
+        raise NotImplementedError
+
+    def delete(self, token):
+        raise NotImplementedError
+
+    def changes(self, since=None):
+        """
+        Return (cursor, tokens) with the tokens written or deleted by any
+        process after the cursor since. Without since, returns the current
+        cursor and no tokens.
+        """
+        raise NotImplementedError
+
+    def count(self):
+        """Number of stored tokens (expired ones included until swept)"""
+        raise NotImplementedError
+
+    def expiries(self):
+        """Return {token: expires} for every stored token that has not expired"""
+        raise NotImplementedError
+
+    def _sweep(self, now):
+        """Delete tokens that expired before now and return how many were deleted"""
+        raise NotImplementedError
+
+    def sweep(self):
+        """Delete expired tokens, recording the sweep duration"""
+        start = time.perf_counter()
+        removed = self._sweep(datetime.utcnow())
+        self.last_sweep_ms = (time.perf_counter() - start) * 1000
+        self.sweeps += 1
+        self.swept += removed
+        return removed
+
+    def stats(self):
+        return {
+            "store": self.name,
+            "tokens": self.count(),
+            "max_tokens_per_user": self.max_tokens_per_user,
+            "max_tokens": self.max_tokens,
+            "evicted_per_user": self.evicted_per_user,
+            "evicted_total": self.evicted_total,
+            "sweeps": self.sweeps,
+            "swept": self.swept,
+            "last_sweep_ms": round(self.last_sweep_ms, 3)
+        }
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    Tokens in a dict of this process only.
+
+    A min-heap of (expires, token) is the expiry index: sweeps pop expired
+    tokens off the top, and the total cap evicts from the top as well. Deleted
+    tokens are left in the heap and skipped when popped; the heap is rebuilt
+    once such stale entries outnumber the live tokens.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_tokens_per_user=0, max_tokens=0):
+        super().__init__(max_tokens_per_user, max_tokens)
+        self._tokens = {}
+        self._by_user = {}
+        self._expiry_heap = []
+        self._lock = threading.Lock()
+        self._changes = deque()
+        self._change_seq = 0
+
+    def _log_changes(self, tokens):
+        now = time.monotonic()
+        for token in tokens:
+            self._change_seq += 1
+            self._changes.append((self._change_seq, token, now))
+        while self._changes and self._changes[0][2] < now - TOKEN_CHANGE_LOG_SECONDS:
+            self._changes.popleft()
+
+    def put(self, token, token_data):
+        evicted = []
+        with self._lock:
+            self._remove(token)
+            self._tokens[token] = dict(token_data)
+            self._by_user.setdefault(token_data["username"], OrderedDict())[token] = None
+            heapq.heappush(self._expiry_heap, (token_data["expires"], token))
+
+            user_tokens = self._by_user[token_data["username"]]
+            while self.max_tokens_per_user and len(user_tokens) > self.max_tokens_per_user:
+                oldest = next(iter(user_tokens))
+                self._remove(oldest)
+                evicted.append(oldest)
+                self.evicted_per_user += 1
+            while self.max_tokens and len(self._tokens) > self.max_tokens:
+                expires, oldest = heapq.heappop(self._expiry_heap)
+                token_data = self._tokens.get(oldest)
+                if token_data is not None and token_data["expires"] == expires:
+                    self._remove(oldest)
+                    evicted.append(oldest)
+                    self.evicted_total += 1
+
+            if len(self._expiry_heap) > 2 * len(self._tokens) + 64:
+                self._expiry_heap = [(data["expires"], t) for t, data in self._tokens.items()]
+                heapq.heapify(self._expiry_heap)
+            self._log_changes([token, *evicted])
+        return evicted
+
+    def _remove(self, token):
+        token_data = self._tokens.pop(token, None)
+        if token_data is None:
+            return False
+        user_tokens = self._by_user[token_data["username"]]
+        del user_tokens[token]
+        if not user_tokens:
+            del self._by_user[token_data["username"]]
+        return True
+
+    def get(self, token):
+        token_data = self._tokens.get(token)
+        return dict(token_data) if token_data is not None else None
+
+    def delete(self, token):
+        with self._lock:
+            if self._remove(token):
+                self._log_changes([token])
+
+    def changes(self, since=None):
+        with self._lock:
+            if since is None:
+                return self._change_seq, []
+            return self._change_seq, [token for seq, token, _ in self._changes if seq > since]
+
+    def count(self):
+        return len(self._tokens)
+
+    def expiries(self):
+        now = datetime.utcnow()
+        with self._lock:
+            return {token: data["expires"] for token, data in self._tokens.items() if data["expires"] >= now}
+
+    def _sweep(self, now):
+        removed = 0
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] < now:
+                expires, token = heapq.heappop(self._expiry_heap)
+                token_data = self._tokens.get(token)
+                # Skip stale heap entries for tokens deleted or re-issued since
+                if token_data is not None and token_data["expires"] == expires:
+                    self._remove(token)
+                    removed += 1
+        return removed
+
+
+class SQLiteTokenStore(TokenStore):
+    """
+    Tokens in a WAL-mode SQLite database shared by all worker processes.
+
+    WAL lets readers in every worker run concurrently with a writer, and one
+    long-lived connection per process avoids reopening the file on each check.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=TOKEN_DB_PATH, max_tokens_per_user=0, max_tokens=0, table="tokens"):
+        super().__init__(max_tokens_per_user, max_tokens)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid token table name: {table}")
+        self.path = Path(path)
+        self.table = table
+        self.path.parent.mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            token TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL,
+            expires TEXT NOT NULL
+        )
+        ''')
+        # Expiry index for sweeps and total-cap eviction, per-user index for the user cap
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_expires ON {self.table} (expires)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_username ON {self.table} (username, expires)")
+        # Change log read by the caches of every process
+        self._conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {self.table}_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            token TEXT NOT NULL,
+            changed_at REAL NOT NULL
+        )
+        ''')
+
+    def _log_changes(self, tokens):
+        now = time.time()
+        self._conn.executemany(
+            f"INSERT INTO {self.table}_changes (token, changed_at) VALUES (?, ?)", [(t, now) for t in tokens]
+        )
+
+    def put(self, token, token_data):
+        evicted = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (token, username, role, expires) VALUES (?, ?, ?, ?)",
+                    (token, token_data["username"], token_data["role"], token_data["expires"].isoformat())
+                )
+                if self.max_tokens_per_user:
+                    rows = self._conn.execute(
+                        f"SELECT token FROM {self.table} WHERE username = ? ORDER BY expires DESC LIMIT -1 OFFSET ?",
+                        (token_data["username"], self.max_tokens_per_user)
+                    ).fetchall()
+                    self.evicted_per_user += len(rows)
+                    evicted.extend(row[0] for row in rows)
+                if self.max_tokens:
+                    excess = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] - len(evicted) - self.max_tokens
+                    if excess > 0:
+                        rows = self._conn.execute(
+                            f"SELECT token FROM {self.table} WHERE token NOT IN ({','.join('?' * len(evicted))}) "
+                            "ORDER BY expires LIMIT ?",
+                            (*evicted, excess)
+                        ).fetchall()
+                        self.evicted_total += len(rows)
+                        evicted.extend(row[0] for row in rows)
+                self._conn.executemany(f"DELETE FROM {self.table} WHERE token = ?", [(t,) for t in evicted])
+                self._log_changes([token, *evicted])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return evicted
+
+    def get(self, token):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT username, role, expires FROM {self.table} WHERE token = ?", (token,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"username": row[0], "role": row[1], "expires": datetime.fromisoformat(row[2])}
+
+    def delete(self, token):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute(f"DELETE FROM {self.table} WHERE token = ?", (token,)).rowcount:
+                    self._log_changes([token])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def changes(self, since=None):
+        with self._lock:
+            if since is None:
+                return self._conn.execute(f"SELECT IFNULL(MAX(seq), 0) FROM {self.table}_changes").fetchone()[0], []
+            rows = self._conn.execute(
+                f"SELECT seq, token FROM {self.table}_changes WHERE seq > ? ORDER BY seq", (since,)
+            ).fetchall()
+        return (rows[-1][0] if rows else since), [row[1] for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def expiries(self):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT token, expires FROM {self.table} WHERE expires >= ?", (datetime.utcnow().isoformat(),)
+            ).fetchall()
+        return {token: datetime.fromisoformat(expires) for token, expires in rows}
+
+    def _sweep(self, now):
+        with self._lock:
+            removed = self._conn.execute(f"DELETE FROM {self.table} WHERE expires < ?", (now.isoformat(),)).rowcount
+            self._conn.execute(
+                f"DELETE FROM {self.table}_changes WHERE changed_at < ?", (time.time() - TOKEN_CHANGE_LOG_SECONDS,)
+            )
+            return removed
+
+
+class RedisTokenStore(TokenStore):
+    """
+    Tokens as expiring keys in Redis (or any client with the same interface).
+
+    Redis expires the token keys itself. The expiry index is a sorted set of
+    "token:username" members scored by expiry time, with one sorted set of
+    tokens per user for the per-user cap. Each cap is enforced in a MULTI/EXEC
+    transaction together with the add to its sorted set, so concurrent logins
+    cannot both find room under a cap. The change log is a Redis stream.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix="auth:tokens:", max_tokens_per_user=0, max_tokens=0):
+        super().__init__(max_tokens_per_user, max_tokens)
+        self.client = client
+        self.prefix = prefix
+        self.index_key = prefix + "index"
+        self.changes_key = prefix + "changes"
+
+    def _user_key(self, username):
+        return f"{self.prefix}user:{username}"
+
+    def _log_changes(self, pipe, tokens):
+        oldest = int((time.time() - TOKEN_CHANGE_LOG_SECONDS) * 1000)
+        pipe.xadd(self.changes_key, {"tokens": json.dumps(tokens)}, minid=oldest, approximate=True)
+
+    def put(self, token, token_data):
+        username = token_data["username"]
+        expires_at = epoch_seconds(token_data["expires"])
+        ttl = max(int(expires_at - time.time()), 1)
+        user_key = self._user_key(username)
+
+        # Add to the user's tokens and pop the oldest beyond the per-user cap
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + token, encode_token_data(token_data), ex=ttl)
+        pipe.zremrangebyscore(user_key, "-inf", time.time())
+        pipe.zadd(user_key, {token: expires_at})
+        pipe.expire(user_key, ttl)
+        if self.max_tokens_per_user:
+            pipe.zrange(user_key, 0, -self.max_tokens_per_user - 1)
+            pipe.zremrangebyrank(user_key, 0, -self.max_tokens_per_user - 1)
+        results = pipe.execute()
+        over_user = [as_text(member) for member in results[4]] if self.max_tokens_per_user else []
+
+        # Then the same for the expiry index and the total cap
+        pipe = self.client.pipeline()
+        for oldest in over_user:
+            pipe.delete(self.prefix + oldest)
+            pipe.zrem(self.index_key, f"{oldest}:{username}")
+        pipe.zadd(self.index_key, {f"{token}:{username}": expires_at})
+        if self.max_tokens:
+            pipe.zrange(self.index_key, 0, -self.max_tokens - 1)
+            pipe.zremrangebyrank(self.index_key, 0, -self.max_tokens - 1)
+        results = pipe.execute()
+        # A token popped by both caps (by two concurrent logins) is counted by
+        # whichever deletes its key
+        evicted = [oldest for oldest, deleted in zip(over_user, results[0:2 * len(over_user):2]) if deleted]
+        self.evicted_per_user += len(evicted)
+        over_total = [as_text(member).split(":", 1) for member in results[-2]] if self.max_tokens else []
+
+        pipe = self.client.pipeline()
+        for oldest, oldest_user in over_total:
+            pipe.delete(self.prefix + oldest)
+            pipe.zrem(self._user_key(oldest_user), oldest)
+        self._log_changes(pipe, [token, *over_user, *(oldest for oldest, _ in over_total)])
+        results = pipe.execute()
+        evicted_total = [oldest for (oldest, _), deleted in zip(over_total, results[0:2 * len(over_total):2]) if deleted]
+        self.evicted_total += len(evicted_total)
+        return evicted + evicted_total
+
+    def get(self, token):
+        raw = self.client.get(self.prefix + token)
+        return decode_token_data(raw) if raw is not None else None
+
+    def delete(self, token):
+        raw = self.client.get(self.prefix + token)
+        if raw is None:
+            return
+        username = json.loads(raw)["username"]
+        pipe = self.client.pipeline()
+        pipe.delete(self.prefix + token)
+        pipe.zrem(self.index_key, f"{token}:{username}")
+        pipe.zrem(self._user_key(username), token)
+        self._log_changes(pipe, [token])
+        pipe.execute()
+
+    def changes(self, since=None):
+        if since is None:
+            latest = self.client.xrevrange(self.changes_key, count=1)
+            return (as_text(latest[0][0]) if latest else "0-0"), []
+        entries = self.client.xrange(self.changes_key, min=f"({since}")
+        tokens = []
+        for _, fields in entries:
+            tokens.extend(json.loads(fields[b"tokens"] if b"tokens" in fields else fields["tokens"]))
+        return (as_text(entries[-1][0]) if entries else since), tokens
+
+    def count(self):
+        return self.client.zcard(self.index_key)
+
+    def expiries(self):
+        members = self.client.zrangebyscore(self.index_key, time.time(), "+inf", withscores=True)
+        return {
+            as_text(member).split(":", 1)[0]: datetime.fromtimestamp(score, timezone.utc).replace(tzinfo=None)
+            for member, score in members
+        }
+
+    def _sweep(self, now):
+        # The token keys expire on their own; drop them from the index
+        cutoff = epoch_seconds(now)
+        expired = self.client.zrangebyscore(self.index_key, "-inf", cutoff)
+        for member in expired:
+            token, username = as_text(member).split(":", 1)
+            self.client.zrem(self._user_key(username), token)
+        self.client.zremrangebyscore(self.index_key, "-inf", cutoff)
+        return len(expired)
+
+
+class TokenCache:
+    """
+    In-process read-through cache in front of a token store.
+
+    Unknown tokens are cached too, so repeated checks of a missing key do not
+    reach the store. Changes made through this cache apply to it at once;
+    refresh() reads the store's change log and drops the entries of tokens
+    changed by other processes, so call it every second or so (auth_api runs
+    it in a background task). Entries also expire after ttl_seconds.
+
+    get() may read the store; from the event loop use fetch(), which answers
+    cache hits in place and reads the store in a thread on a miss.
+    """
+
+    def __init__(self, store, max_entries=10000, ttl_seconds=5.0):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._cursor = store.changes()[0]
+        self._refreshed = time.monotonic()
+        # Bumped whenever entries are dropped, so a store read that raced
+        # with the drop is not cached
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def _cached(self, token):
+        """(True, token data) for a live cache entry, (False, None) on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return True, dict(entry[0]) if entry[0] is not None else None
+            self.misses += 1
+            return False, None
+
+    def _load(self, token):
+        generation = self._generation
+        token_data = self.store.get(token)
+        if self.max_entries > 0:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[token] = (token_data, time.monotonic() + self.ttl_seconds)
+                    self._entries.move_to_end(token)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return token_data
+
+    def get(self, token):
+        hit, token_data = self._cached(token)
+        return token_data if hit else self._load(token)
+
+    async def fetch(self, token):
+        hit, token_data = self._cached(token)
+        return token_data if hit else await asyncio.to_thread(self._load, token)
+
+    def _drop(self, tokens):
+        with self._lock:
+            self._generation += 1
+            for token in tokens:
+                self._entries.pop(token, None)
+
+    def put(self, token, token_data):
+        evicted = self.store.put(token, token_data)
+        self._drop([token, *evicted])
+        return evicted
+
+    def delete(self, token):
+        self.store.delete(token)
+        self._drop([token])
+
+    def refresh(self):
+        """Drop the entries of tokens changed in the store since the last refresh"""
+        stale = time.monotonic() - self._refreshed > TOKEN_CHANGE_LOG_SECONDS / 2
+        cursor, changed = self.store.changes(None if stale else self._cursor)
+        if stale:
+            # Changes may have left the log since the last refresh
+            with self._lock:
+                self._generation += 1
+                self.invalidated += len(self._entries)
+                self._entries.clear()
+        else:
+            self._drop(changed)
+            self.invalidated += len(changed)
+        self._cursor = cursor
+        self._refreshed = time.monotonic()
+        return len(changed)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "store": self.store.name,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidated": self.invalidated
+        }
+
+
+class RevocationSet:
+    """
+    Every revoked token id, held in memory.
+
+    Checking a token is a dict lookup, with no store I/O. The set is loaded
+    from the store once, revocations made through it are added at once, and
+    refresh() adds the ones made by other processes from the store's change
+    log (auth_api runs it every second or so). Ids are dropped once the
+    token they revoke has expired.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._expiry_heap = []
+        self.refreshes = 0
+        self.reload()
+
+    def _add(self, token, expires):
+        self._revoked[token] = expires
+        heapq.heappush(self._expiry_heap, (expires, token))
+
+    def reload(self):
+        """Replace the set with the revocations in the store"""
+        cursor = self.store.changes()[0]
+        revoked = self.store.expiries()
+        with self._lock:
+            self._revoked = {}
+            self._expiry_heap = []
+            for token, expires in revoked.items():
+                self._add(token, expires)
+            self._cursor = cursor
+            self._refreshed = time.monotonic()
+
+    def refresh(self):
+        """Apply revocations made since the last refresh and drop expired ones"""
+        if time.monotonic() - self._refreshed > TOKEN_CHANGE_LOG_SECONDS / 2:
+            # Changes may have left the log since the last refresh
+            self.reload()
+            return
+        cursor, changed = self.store.changes(self._cursor)
+        updates = {token: self.store.get(token) for token in set(changed)}
+        now = datetime.utcnow()
+        with self._lock:
+            for token, token_data in updates.items():
+                if token_data is None:
+                    self._revoked.pop(token, None)
+                else:
+                    self._add(token, token_data["expires"])
+            while self._expiry_heap and self._expiry_heap[0][0] < now:
+                expires, token = heapq.heappop(self._expiry_heap)
+                if self._revoked.get(token) == expires:
+                    del self._revoked[token]
+            self._cursor = cursor
+            self._refreshed = time.monotonic()
+            self.refreshes += 1
+
+    def is_revoked(self, token):
+        return token in self._revoked
+
+    def revoke(self, token, token_data):
+        """Store a revocation and add it to this process's set"""
+        self.store.put(token, token_data)
+        with self._lock:
+            self._add(token, token_data["expires"])
+
+    def stats(self):
+        return {"revoked": len(self._revoked), "refreshes": self.refreshes}
+
+
+def create_token_store(kind=None, max_tokens_per_user=0, max_tokens=0, namespace="tokens"):
+    """
+    Build the token store selected by AUTH_TOKEN_STORE (memory, sqlite or redis).
+
+    namespace separates independent sets of tokens in one backend (the SQLite
+    table name or the Redis key prefix).
+    """
+    kind = kind or os.environ.get("AUTH_TOKEN_STORE", "sqlite")
+    caps = {"max_tokens_per_user": max_tokens_per_user, "max_tokens": max_tokens}
+    if kind == "memory":
+        return MemoryTokenStore(**caps)
+    if kind == "sqlite":
+        return SQLiteTokenStore(os.environ.get("AUTH_TOKEN_DB", TOKEN_DB_PATH), table=namespace, **caps)
+    if kind == "redis":
+        url = os.environ.get("AUTH_REDIS_URL")
+        if not url:
+            raise ValueError("AUTH_TOKEN_STORE=redis requires AUTH_REDIS_URL")
+        import redis
+        return RedisTokenStore(redis.Redis.from_url(url), prefix=f"auth:{namespace}:", **caps)
+    raise ValueError(f"Unknown AUTH_TOKEN_STORE: {kind}")
@@ -0,0 +1,107 @@
+"""
+Short-lived in-memory cache of users.db rows.
+
+User rows almost never change, yet every login, registration check and token
+validation used to read them from SQLite. UserCache keeps recently used rows
+for a short TTL, bounded in size (least recently used rows are dropped first).
+Unknown usernames are cached as well, for a shorter TTL, so repeated lookups
+of a missing user (failed logins, registration of a new name) skip the
+database too. Writers call invalidate() so this process never serves a stale
+row, even when a read of the old row is still in flight; other worker
+processes see changes once their entries expire.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+# Marks a cached "no such user" entry
+MISSING = object()
+
+
+class UserCache:
+    """LRU + TTL cache of user rows keyed on username, with negative entries"""
+
+    def __init__(self, max_entries=10000, ttl_seconds=30.0, negative_ttl_seconds=5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped whenever entries are dropped, so a database read that raced
+        # with the drop is not cached
+        self._generation = 0
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _cached(self, username):
+        """(True, row or None) for a live cache entry, (False, None) on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(username)
+                if entry[0] is MISSING:
+                    self.negative_hits += 1
+                    return True, None
+                self.hits += 1
+                return True, dict(entry[0])
+            self.misses += 1
+            return False, None
+
+    def _load(self, username, load):
+        generation = self._generation
+        user = load(username)
+        if self.max_entries > 0:
+            ttl = self.ttl_seconds if user is not None else self.negative_ttl_seconds
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[username] = (dict(user) if user is not None else MISSING, time.monotonic() + ttl)
+                    self._entries.move_to_end(username)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        return user
+
+    def get(self, username, load):
+        """Return the cached row for username, calling load(username) on a miss"""
+        hit, user = self._cached(username)
+        return user if hit else self._load(username, load)
+
+    async def fetch(self, username, load):
+        """Like get(), but runs load in a thread so a miss does not block the event loop"""
+        hit, user = self._cached(username)
+        return user if hit else await asyncio.to_thread(self._load, username, load)
+
+    def invalidate(self, username):
+        """Drop the entry for a user whose row was just written"""
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(username, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            "db_lookups_saved": self.hits + self.negative_hits,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Benchmark of users.db lookups: a new connection per call vs the connection pool.
+
+Fills a temporary users.db, then runs the get_user query from several threads
+at once (a login storm), opening a fresh sqlite3 connection per call as the
+auth module used to, and through auth.db_pool.ConnectionPool. Reports p50/p99
+latency and lookups/sec for both, plus the pool's checkout metrics.
+
+Usage: python benchmarks/bench_auth_db.py [--users 10000] [--lookups 20000] [--threads 8]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from common import format_latencies
+
+from auth.db_pool import ConnectionPool
+
+USER_QUERY = "SELECT id, username, password_hash, role, name, email FROM users WHERE username = ?"
+
+
+def create_users(path, n):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT NOT NULL,
+        name TEXT,
+        email TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.executemany(
+        "INSERT INTO users (username, password_hash, role, name, email) VALUES (?, ?, ?, ?, ?)",
+        ((f"user{i}", "0" * 64, "farmer", f"User {i}", f"user{i}@example.com") for i in range(n))
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_storm(lookup, usernames, threads):
+    """Run lookup(username) for every username on a thread pool; return (latencies ms, lookups/sec)"""
+    def timed(username):
+        start = time.perf_counter()
+        lookup(username)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = np.array(list(executor.map(timed, usernames)))
+    return latencies, len(usernames) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000, help="Number of users in the database")
+    parser.add_argument('--lookups', type=int, default=20000, help="Number of user lookups")
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent lookups")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        create_users(path, args.users)
+        usernames = [f"user{random.randrange(args.users)}" for _ in range(args.lookups)]
+
+        def connect_per_call(username):
+            conn = sqlite3.connect(path)
+            row = conn.execute(USER_QUERY, (username,)).fetchone()
+            conn.close()
+            return row
+
+        pool = ConnectionPool(path, size=args.threads)
+
+        def pooled(username):
+            with pool.connection() as conn:
+                return conn.execute(USER_QUERY, (username,)).fetchone()
+
+        print(f"{args.lookups} lookups of {args.users} users from {args.threads} threads\n")
+        for label, lookup in (("connect per call", connect_per_call), ("connection pool", pooled)):
+            latencies, rate = run_storm(lookup, usernames, args.threads)
+            print(f"{format_latencies(label, latencies)}  {rate:,.0f} lookups/sec")
+        print(f"\nPool: {pool.stats()}")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
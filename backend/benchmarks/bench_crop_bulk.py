@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Benchmark of bulk crop listing writes versus one request per listing.
+
+Creates --rows listings in a temporary farmer.db through POST /farmer (one
+request and one commit per listing) and through a single POST /farmer/bulk,
+then updates them with PUT /farmer/{crop_id} and with PUT /farmer/bulk, and
+prints rows/sec for each path. Requests go through the FastAPI app in process.
+
+Usage: python benchmarks/bench_crop_bulk.py [--rows 5000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import common  # adds the backend directory to sys.path
+
+from bench_crop_queries import CROPS, LOCATIONS
+import farmer.dashboard_api as farmer_api
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+def listings(n):
+    return [
+        {"name": random.choice(CROPS), "quantity": random.randint(10, 500), "unit": "kg",
+         "price_per_unit": round(random.uniform(10, 120), 2), "description": "Cooperative upload",
+         "location": random.choice(LOCATIONS), "available": True, "farmer_id": random.randint(1, 100)}
+        for _ in range(n)
+    ]
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    print(f"{label:<28} {seconds:8.2f}s  {n / seconds:10,.0f} rows/sec")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000, help="Listings to create and update")
+    args = parser.parse_args()
+
+    app = FastAPI()
+    app.include_router(farmer_api.router, prefix="/farmer")
+    client = TestClient(app)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        farmer_api.DB_PATH = os.path.join(tmp, "farmer.db")
+        farmer_api.setup_db(farmer_api.DB_PATH)
+        rows = listings(args.rows)
+
+        print(f"{args.rows:,} listings\n")
+        ids = timed("POST /farmer per listing", args.rows,
+                    lambda: [client.post("/farmer/", json=row).json()["id"] for row in rows])
+        timed("POST /farmer/bulk", args.rows, lambda: client.post("/farmer/bulk", json=rows).raise_for_status())
+
+        updates = [{**row, "id": crop_id, "quantity": row["quantity"] + 1} for row, crop_id in zip(rows, ids)]
+        timed("PUT /farmer/{id} per listing", args.rows,
+              lambda: [client.put(f"/farmer/{row['id']}", json=row).raise_for_status() for row in updates])
+        timed("PUT /farmer/bulk", args.rows, lambda: client.put("/farmer/bulk", json=updates).raise_for_status())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Measures the streamed crop catalogue export of a running server.
+
+Downloads GET /farmer/export as NDJSON and CSV and prints, for each format,
+the time to the first byte, the total time, rows/sec and MB/sec. With
+--server-pid (Linux only) it also prints the server's resident memory before
+and after the exports, and its peak, which should stay flat however large
+the catalogue is.
+
+Fill farmer.db first (for example with create_crops from bench_crop_queries.py),
+start the server (python main.py), then run:
+python benchmarks/bench_crop_export.py [--url http://localhost:8000] [--server-pid PID]
+"""
+
+import argparse
+import time
+
+import requests
+
+
+def memory_kb(pid, field):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return None
+
+
+def export(url, fmt):
+    """Stream one export and return (ms to first byte, seconds, rows, bytes)"""
+    start = time.perf_counter()
+    first_byte = None
+    rows = size = 0
+    with requests.get(f"{url}/farmer/export", params={"format": fmt}, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=65536):
+            if first_byte is None:
+                first_byte = (time.perf_counter() - start) * 1000
+            rows += chunk.count(b"\n")
+            size += len(chunk)
+    if fmt == "csv":
+        rows -= 1  # header
+    return first_byte, time.perf_counter() - start, rows, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default="http://localhost:8000", help="Base URL of the running server")
+    parser.add_argument('--server-pid', type=int, help="PID of the server, to report its memory use")
+    args = parser.parse_args()
+
+    if args.server_pid:
+        print(f"server RSS before: {memory_kb(args.server_pid, 'VmRSS') / 1024:.1f} MB")
+    for fmt in ("ndjson", "csv"):
+        first_byte, seconds, rows, size = export(args.url, fmt)
+        print(f"{fmt:<7} first byte {first_byte:8.1f} ms  total {seconds:6.1f}s  "
+              f"{rows:,} rows  {rows / seconds:,.0f} rows/s  {size / 1e6 / seconds:.1f} MB/s")
+    if args.server_pid:
+        print(f"server RSS after: {memory_kb(args.server_pid, 'VmRSS') / 1024:.1f} MB, "
+              f"peak {memory_kb(args.server_pid, 'VmHWM') / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+Checks that the crop listing queries in farmer.db use their indexes.
+
+Fills a temporary farmer.db with generated listings, times the listing,
+marketplace and dashboard stats queries on the bare table, then applies the
+schema migrations (farmer.dashboard_api.setup_db) and times them again. The
+EXPLAIN QUERY PLAN of each query is checked against the index it should use;
+the script exits with an error if any plan falls back to a table scan or an
+extra sort.
+
+Usage: python benchmarks/bench_crop_queries.py [--rows 2000000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import common  # adds the backend directory to sys.path
+
+from farmer.crop_stats import read_stats
+from farmer.dashboard_api import ALL_CROPS_QUERY, setup_db
+from consumer.dashboard_api import MARKETPLACE_QUERY
+
+CROPS = ["Rice", "Wheat", "Tomatoes", "Potatoes", "Onions", "Maize", "Cotton", "Sugarcane",
+         "Soybean", "Groundnut", "Mustard", "Chickpea", "Lentil", "Banana", "Mango", "Grapes"]
+LOCATIONS = ["Punjab", "Haryana", "Maharashtra", "Uttar Pradesh", "Karnataka", "Gujarat"]
+
+# Keyset cursor half way through the generated listings (a page deep into GET /farmer)
+PAGE_CURSOR = (time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - 182 * 86400)), 2 ** 62)
+PAGE_QUERY = "SELECT * FROM crops WHERE {}(created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT 101"
+
+# (label, query, parameters, plan lines that must appear, plan fragments that must not appear)
+QUERIES = [
+    ("all crops", ALL_CROPS_QUERY, (),
+     ["SCAN crops USING INDEX idx_crops_created_at"], ["TEMP B-TREE"]),
+    ("crops page", PAGE_QUERY.format(""), PAGE_CURSOR,
+     ["SEARCH crops USING INDEX idx_crops_created_at (created_at<?)"], ["TEMP B-TREE"]),
+    ("crops page by farmer", PAGE_QUERY.format("farmer_id = ? AND "), (42, *PAGE_CURSOR),
+     ["SEARCH crops USING INDEX idx_crops_farmer_created (farmer_id=? AND created_at<?)"], ["TEMP B-TREE"]),
+    ("crops page by location", PAGE_QUERY.format("location = ? AND price_per_unit <= ? AND "), ("Punjab", 50, *PAGE_CURSOR),
+     ["SEARCH crops USING INDEX idx_crops_location_created (location=? AND created_at<?)"], ["TEMP B-TREE"]),
+    ("marketplace", MARKETPLACE_QUERY, (),
+     ["SEARCH crops USING COVERING INDEX idx_crops_available_name (available=?)"], ["TEMP B-TREE"]),
+    # The stats endpoint reads summary tables; these are the recomputations of the consistency check
+    ("stats: crops by type", "SELECT name, COUNT(*) as count FROM crops GROUP BY name ORDER BY count DESC", (),
+     ["SCAN crops USING COVERING INDEX idx_crops_name"], ["TEMP B-TREE FOR GROUP BY"]),
+    ("stats: total value", "SELECT SUM(quantity * price_per_unit) FROM crops", (),
+     ["COVERING INDEX"], []),
+]
+
+
+def create_crops(path, n):
+    """Create the crops table as the original schema did (no indexes) and fill it"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE crops (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        quantity REAL NOT NULL,
+        unit TEXT NOT NULL,
+        price_per_unit REAL NOT NULL,
+        description TEXT,
+        location TEXT,
+        available INTEGER DEFAULT 1,
+        farmer_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    start = time.time() - 365 * 86400
+    conn.executemany(
+        "INSERT INTO crops (name, quantity, unit, price_per_unit, description, location, available, farmer_id, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ((crop, random.randint(10, 500), "kg", round(random.uniform(10, 120), 2), f"Fresh {crop.lower()}",
+          random.choice(LOCATIONS), int(random.random() < 0.8), random.randint(1, 5000),
+          time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + random.uniform(0, 365 * 86400))))
+         for crop in random.choices(CROPS, k=n))
+    )
+    conn.commit()
+    conn.close()
+
+
+def query_plan(conn, query, params):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def time_queries(conn):
+    """Run every query to completion; return (ms to the first 100 rows, ms for all rows) per query"""
+    timings = {}
+    for label, query, params, _, _ in QUERIES:
+        start = time.perf_counter()
+        cursor = conn.execute(query, params)
+        cursor.fetchmany(100)
+        first_page = (time.perf_counter() - start) * 1000
+        for _ in cursor:
+            pass
+        timings[label] = (first_page, (time.perf_counter() - start) * 1000)
+    return timings
+
+
+def check_plans(conn):
+    """Print the plan of every query and return the list of failed checks"""
+    failures = []
+    for label, query, params, expected, forbidden in QUERIES:
+        plan = query_plan(conn, query, params)
+        print(f"{label}:")
+        for line in plan:
+            print(f"    {line}")
+        for fragment in expected:
+            if not any(fragment in line for line in plan):
+                failures.append(f"{label}: expected '{fragment}'")
+        for fragment in forbidden:
+            if any(fragment in line for line in plan):
+                failures.append(f"{label}: unexpected '{fragment}'")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000000, help="Number of crop listings")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "farmer.db")
+        print(f"Generating {args.rows:,} crop listings...")
+        create_crops(path, args.rows)
+
+        conn = sqlite3.connect(path)
+        before = time_queries(conn)
+        conn.close()
+
+        start = time.perf_counter()
+        setup_db(path)
+        print(f"Migrations and ANALYZE took {time.perf_counter() - start:.1f}s\n")
+
+        conn = sqlite3.connect(path)
+        failures = check_plans(conn)
+        after = time_queries(conn)
+        start = time.perf_counter()
+        read_stats(conn)
+        summary_ms = (time.perf_counter() - start) * 1000
+        conn.close()
+
+    print(f"\n{'':<24} {'first 100 rows':>28} {'all rows':>28}")
+    print(f"{'query':<24} {'no indexes':>14}{'indexed':>14} {'no indexes':>14}{'indexed':>14}")
+    for label in before:
+        print(f"{label:<24} {before[label][0]:12.1f}ms{after[label][0]:12.1f}ms "
+              f"{before[label][1]:12.1f}ms{after[label][1]:12.1f}ms")
+    print(f"dashboard stats from the summary tables: {summary_ms:.2f}ms")
+
+    if failures:
+        print("\nQuery plan check FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nQuery plan check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Benchmark of the farmer-scoped listing and stats endpoints as the platform grows.
+
+For each platform size, fills a temporary farmer.db with --listings crops for
+every farmer, applies the schema migrations and calls
+GET /farmer/farmers/{farmer_id}/crops (with and without a crop name filter)
+and GET /farmer/farmers/{farmer_id}/dashboard/stats for random farmers
+through the FastAPI app. The p50/p99 latency per request should stay flat
+from the smallest platform to the largest.
+
+Usage: python benchmarks/bench_farmer_scoped.py [--farmers 1000,10000,100000] [--listings 20]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from common import format_latencies
+
+from bench_crop_queries import CROPS, LOCATIONS
+import farmer.dashboard_api as farmer_api
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+def create_farmers(path, farmers, listings):
+    """Create the bare crops table and give every farmer `listings` crops"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE crops (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        quantity REAL NOT NULL,
+        unit TEXT NOT NULL,
+        price_per_unit REAL NOT NULL,
+        description TEXT,
+        location TEXT,
+        available INTEGER DEFAULT 1,
+        farmer_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    start = time.time() - 365 * 86400
+    conn.executemany(
+        "INSERT INTO crops (name, quantity, unit, price_per_unit, description, location, available, farmer_id, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ((random.choice(CROPS), random.randint(10, 500), "kg", round(random.uniform(10, 120), 2), None,
+          random.choice(LOCATIONS), 1, farmer_id,
+          time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + random.uniform(0, 365 * 86400))))
+         for _ in range(listings) for farmer_id in range(1, farmers + 1))
+    )
+    conn.commit()
+    conn.close()
+
+
+def time_requests(client, paths):
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--farmers', default="1000,10000,100000", help="Comma-separated platform sizes (farmers)")
+    parser.add_argument('--listings', type=int, default=20, help="Crop listings per farmer")
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per endpoint and size")
+    args = parser.parse_args()
+
+    app = FastAPI()
+    app.include_router(farmer_api.router, prefix="/farmer")
+    client = TestClient(app)
+
+    for farmers in (int(size) for size in args.farmers.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "farmer.db")
+            create_farmers(path, farmers, args.listings)
+            farmer_api.setup_db(path)
+            farmer_api.DB_PATH = path
+
+            farmer_ids = [random.randint(1, farmers) for _ in range(args.requests)]
+            print(f"\n{farmers:,} farmers x {args.listings} listings ({farmers * args.listings:,} crops)")
+            for label, template in (
+                ("farmer crops", "/farmer/farmers/{}/crops"),
+                ("farmer crops by name", "/farmer/farmers/{}/crops?name=Rice"),
+                ("farmer stats", "/farmer/farmers/{}/dashboard/stats"),
+            ):
+                latencies = time_requests(client, [template.format(farmer_id) for farmer_id in farmer_ids])
+                print(format_latencies(label, latencies))
+
+
+if __name__ == "__main__":
+    main()
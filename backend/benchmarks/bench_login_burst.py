@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Checks login throughput and that a login burst does not starve other endpoints.
+
+Sends a burst of concurrent /auth/login/user requests to a running server
+while timing GET /consumer/marketplace from a separate thread, and prints the
+marketplace latency with and without the burst, the login throughput and
+status codes (503s mean the hashing queue applied backpressure) and the
+password hashing pool metrics.
+
+Start the server first (python main.py), then run:
+python benchmarks/bench_login_burst.py [--url http://localhost:8000] [--concurrency 32]
+
+For the baseline with hashing on the event loop, start the server with
+AUTH_HASH_WORKERS=0 and run the benchmark again.
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from common import format_latencies
+from bench_prediction_burst import measure_marketplace, time_marketplace
+
+
+def login(url, username, password):
+    response = requests.post(f"{url}/auth/login/user", json={"username": username, "password": password})
+    return response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default="http://localhost:8000", help="Base URL of the running server")
+    parser.add_argument('--username', default="farmer1", help="User to log in as")
+    parser.add_argument('--password', default="password123", help="Password of that user")
+    parser.add_argument('--requests', type=int, default=200, help="Number of logins in the burst")
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent login clients")
+    args = parser.parse_args()
+
+    idle = measure_marketplace(args.url, 2)
+
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=time_marketplace, args=(args.url, stop, latencies))
+    thread.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        statuses = Counter(executor.map(lambda i: login(args.url, args.username, args.password), range(args.requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+
+    print(format_latencies("marketplace idle", idle))
+    print(format_latencies("marketplace during burst", np.array(latencies)))
+    print(f"burst: {args.requests} logins in {elapsed:.2f}s ({args.requests / elapsed:.1f} logins/s), "
+          f"status codes {dict(statuses)}")
+    print("password hashing:", requests.get(f"{args.url}/auth/stats").json().get("password_hashing"))
+
+
+if __name__ == "__main__":
+    main()
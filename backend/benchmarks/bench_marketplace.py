@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark of GET /consumer/marketplace: a query per request vs the cached snapshot.
+
+Fills a temporary farmer.db with --rows listings and times, through the
+FastAPI app in process:
+- the previous implementation, which queries farmer.db and serializes every
+  available crop for each request
+- the snapshot, answering 200 with the pre-serialized body
+- the snapshot, answering 304 to a client that sends the current ETag
+- the first request after a farmer write, which rebuilds the snapshot
+
+Usage: python benchmarks/bench_marketplace.py [--rows 20000] [--requests 200]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from common import format_latencies
+
+from bench_crop_queries import create_crops
+import consumer.dashboard_api as consumer_api
+from consumer.marketplace_snapshot import MarketplaceSnapshot
+from farmer.dashboard_api import setup_db
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+def time_requests(client, path, n, headers=None, expected_status=200):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == expected_status, response.status_code
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help="Number of crop listings")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "farmer.db")
+        create_crops(path, args.rows)
+        setup_db(path)
+
+        consumer_api.FARMER_DB_PATH = path
+        consumer_api.marketplace_snapshot = MarketplaceSnapshot(path, consumer_api.MARKETPLACE_QUERY)
+
+        app = FastAPI()
+        app.include_router(consumer_api.router, prefix="/consumer")
+
+        @app.get("/uncached", response_model=List[dict])
+        async def uncached_marketplace():
+            """The marketplace endpoint before the snapshot"""
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(consumer_api.MARKETPLACE_QUERY).fetchall()
+            conn.close()
+            return [dict(row) for row in rows]
+
+        client = TestClient(app)
+        etag = client.get("/consumer/marketplace").headers["etag"]
+        stats = consumer_api.marketplace_snapshot.stats()
+        print(f"{args.rows:,} listings, {stats['rows']:,} available, {stats['bytes'] / 1e6:.1f} MB of JSON\n")
+
+        print(format_latencies("query per request", time_requests(client, "/uncached", args.requests)))
+        print(format_latencies("snapshot 200", time_requests(client, "/consumer/marketplace", args.requests)))
+        print(format_latencies("snapshot 304", time_requests(
+            client, "/consumer/marketplace", args.requests, {"If-None-Match": etag}, 304)))
+
+        rebuilds = []
+        writer = sqlite3.connect(path)
+        for i in range(min(args.requests, 20)):
+            writer.execute("UPDATE crops SET quantity = quantity + 1 WHERE id = ?", (i + 1,))
+            writer.commit()
+            rebuilds.extend(time_requests(client, "/consumer/marketplace", 1))
+        writer.close()
+        print(format_latencies("first request after write", np.array(rebuilds)))
+        print(f"\nSnapshot: {consumer_api.marketplace_snapshot.stats()}")
+        consumer_api.marketplace_snapshot.close()
+
+
+if __name__ == "__main__":
+    main()
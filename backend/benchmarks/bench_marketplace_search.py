@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Benchmark of the marketplace full-text and faceted search.
+
+Fills a temporary farmer.db with --rows generated listings, applies the
+schema migrations (which build the FTS5 index) and times
+consumer.marketplace_search.search for a set of typical queries: single
+words, prefixes, several words, filters and filter-only browsing. Each
+search returns a ranked page and the location, unit and price facets.
+
+Usage: python benchmarks/bench_marketplace_search.py [--rows 1000000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from common import format_latencies
+
+from bench_crop_queries import CROPS, LOCATIONS
+from consumer.marketplace_search import search
+from farmer.dashboard_api import setup_db
+
+ADJECTIVES = ["Fresh", "Organic", "Premium", "Sun-dried", "Hand-picked", "Export quality", "Local", "Bulk"]
+DETAILS = ["harvested this week", "pesticide free", "sorted and graded", "from a cooperative farm",
+           "stored in cold storage", "ready for pickup", "sold by the sack"]
+UNITS = ["kg", "quintal", "tonne", "dozen", "crate"]
+
+SEARCHES = [
+    ("single word", {"text": "rice"}),
+    ("prefix", {"text": "tom"}),
+    ("several words", {"text": "organic wheat punjab"}),
+    ("rare words", {"text": "grapes cold storage"}),
+    ("word + filters", {"text": "onions", "location": "Maharashtra", "max_price": 40}),
+    ("word, deep page", {"text": "fresh", "offset": 2000}),
+    ("filters only", {"location": "Gujarat", "unit": "kg", "min_price": 50}),
+]
+
+
+def create_listings(path, n):
+    """Create the bare crops table and fill it with varied listing text"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE crops (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        quantity REAL NOT NULL,
+        unit TEXT NOT NULL,
+        price_per_unit REAL NOT NULL,
+        description TEXT,
+        location TEXT,
+        available INTEGER DEFAULT 1,
+        farmer_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.executemany(
+        "INSERT INTO crops (name, quantity, unit, price_per_unit, description, location, available, farmer_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((crop, random.randint(10, 500), random.choice(UNITS), round(random.uniform(10, 200), 2),
+          f"{random.choice(ADJECTIVES)} {crop.lower()}, {random.choice(DETAILS)}",
+          random.choice(LOCATIONS), int(random.random() < 0.8), random.randint(1, 50000))
+         for crop in random.choices(CROPS, k=n))
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help="Number of crop listings")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs of each search")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "farmer.db")
+        print(f"Generating {args.rows:,} crop listings...")
+        create_listings(path, args.rows)
+        start = time.perf_counter()
+        setup_db(path)
+        print(f"Migrations (indexes, statistics, FTS5 index) took {time.perf_counter() - start:.1f}s\n")
+
+        conn = sqlite3.connect(path)
+        for label, params in SEARCHES:
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = search(conn, **params)
+                latencies.append((time.perf_counter() - start) * 1000)
+            print(f"{format_latencies(label, np.array(latencies))}  {result['total']:>9,} matches")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
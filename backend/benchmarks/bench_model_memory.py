@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Startup time and per-worker memory report for the price model artifacts.
+
+Starts N worker processes the way uvicorn does (fresh interpreters) that each
+load either the joblib Pipeline or the memory-mapped flat model and make a few
+predictions. While all workers are alive, every worker reads its own
+/proc/self/smaps_rollup, so the report shows how much memory the model adds
+to each worker (RSS) and how much of it is really private once the
+page-cache-backed pages are shared between workers (PSS, Private).
+
+Usage: python benchmarks/bench_model_memory.py [--workers 8] [--model-dir DIR]
+Linux only (reads /proc).
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+import warnings
+
+from common import DEFAULT_MODEL_DIR, load_model
+
+from price_prediction.models.export_model import sample_records
+
+MEMORY_FIELDS = ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty')
+
+# Seconds to wait for the workers to load the model and report
+WORKER_TIMEOUT = 120
+
+
+def read_memory():
+    """Return the smaps_rollup memory fields of this process in kB"""
+    memory = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0].rstrip(':') in MEMORY_FIELDS:
+                memory[parts[0].rstrip(':')] = int(parts[1])
+    memory['Private'] = memory.pop('Private_Clean') + memory.pop('Private_Dirty')
+    return memory
+
+
+def worker(engine, model_dir, records, barrier, results):
+    warnings.filterwarnings('ignore')
+    import pandas as pd
+
+    before = read_memory()
+    start = time.perf_counter()
+    if engine == 'flat':
+        from price_prediction.models.flat_forest import FlatForest
+        model = FlatForest.load(os.path.join(model_dir, 'crop_price_model_flat'), mmap_mode='r')
+    else:
+        import joblib
+        model = joblib.load(os.path.join(model_dir, 'crop_price_model.joblib'))
+    load_ms = (time.perf_counter() - start) * 1000
+
+    # Touch every tree so all model pages are resident
+    model.predict(pd.DataFrame(records))
+
+    # Measure only once every worker has loaded the model
+    barrier.wait()
+    after = read_memory()
+    results.put((os.getpid(), load_ms, {field: after[field] - before[field] for field in after}))
+    barrier.wait()
+
+
+def run(engine, workers, model_dir, records):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers, timeout=WORKER_TIMEOUT)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(engine, model_dir, records, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        rows = [results.get(timeout=WORKER_TIMEOUT) for _ in processes]
+    except queue.Empty:
+        for process in processes:
+            process.terminate()
+        raise RuntimeError(f"{engine} workers did not report within {WORKER_TIMEOUT}s")
+    for process in processes:
+        process.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8, help="Number of worker processes per engine")
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR, help="Directory with the model artifacts")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    records = sample_records(*load_model(args.model_dir), 64)
+
+    print(f"{'engine':<10}{'load ms':>10}{'model RSS kB':>14}{'model PSS kB':>14}{'private kB':>12}")
+    for engine in ('pipeline', 'flat'):
+        rows = run(engine, args.workers, args.model_dir, records)
+        load_ms = sorted(row[1] for row in rows)
+        memory = {field: sum(row[2][field] for row in rows) / len(rows) for field in rows[0][2]}
+        print(f"{engine:<10}{load_ms[len(load_ms) // 2]:>10.1f}{memory['Rss']:>14.0f}"
+              f"{memory['Pss']:>14.0f}{memory['Private']:>12.0f}")
+        total_pss = sum(row[2]['Pss'] for row in rows)
+        print(f"{'':<10}total model PSS across {len(rows)} workers: {total_pss / 1024:.1f} MB")
+    print("Load time includes importing the modules each engine needs (scikit-learn for the pipeline).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for single-row price prediction.
+
+Compares the original per-request path (one-row pandas DataFrame through the
+full Pipeline) with the DataFrame-free FastRowPredictor and the NumPy-only
+FlatForest export, reports p50/p99 latency for each and checks that their
+predictions are identical.
+
+Usage: python benchmarks/bench_predict_latency.py [--rows 2000] [--model-dir DIR]
+"""
+
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from common import DEFAULT_MODEL_DIR, load_model, time_calls, format_latencies
+
+from price_prediction.api.fast_inference import FastRowPredictor
+from price_prediction.models.export_model import flatten_model, sample_records
+from price_prediction.models.flat_forest import FlatForest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000, help="Number of single-row predictions to time")
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR, help="Directory with the model artifacts")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    model, feature_columns = load_model(args.model_dir)
+    fast_predictor = FastRowPredictor(model, feature_columns)
+    flat_model = FlatForest(*flatten_model(model, feature_columns))
+    records = sample_records(model, feature_columns, args.rows)
+
+    def dataframe_predict(record):
+        return model.predict(pd.DataFrame({column: [value] for column, value in record.items()}))[0]
+
+    # Warm up both paths before timing
+    for record in records[:20]:
+        dataframe_predict(record)
+        fast_predictor.predict_one(record)
+        flat_model.predict_one(record)
+
+    calls = [(record,) for record in records]
+    before = time_calls(dataframe_predict, calls)
+    fast = time_calls(fast_predictor.predict_one, calls)
+    flat = time_calls(flat_model.predict_one, calls)
+
+    print(format_latencies("DataFrame + Pipeline", before))
+    print(format_latencies("FastRowPredictor", fast))
+    print(format_latencies("FlatForest", flat))
+    for label, after in (("FastRowPredictor", fast), ("FlatForest", flat)):
+        print(f"{label} p50 speedup: {np.percentile(before, 50) / np.percentile(after, 50):.2f}x")
+
+    expected = np.array([dataframe_predict(record) for record in records])
+    for label, predictor in (("FastRowPredictor", fast_predictor), ("FlatForest", flat_model)):
+        actual = np.array([predictor.predict_one(record) for record in records])
+        mismatches = int(np.sum(expected != actual))
+        print(f"{label} identical predictions: {mismatches == 0} "
+              f"({mismatches} mismatches out of {len(records)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Checks that a burst of price predictions does not starve other endpoints.
+
+Sends a burst of concurrent /price-prediction/predict requests to a running
+server while timing GET /consumer/marketplace from a separate thread, and
+prints the marketplace latency with and without the burst together with the
+prediction status codes (503s mean the inference queue applied backpressure)
+and the inference pool metrics.
+
+Start the server first (python main.py), then run:
+python benchmarks/bench_prediction_burst.py [--url http://localhost:8000] [--concurrency 64]
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from common import format_latencies
+
+EXAMPLE_INPUT = {
+    "crop_name": "Rice",
+    "quantity": 100,
+    "season": "Kharif",
+    "region": "Punjab",
+    "rain_fall": 250.5,
+    "temperature": 30.2,
+    "soil_quality": "High"
+}
+
+
+def time_marketplace(url, stop, latencies):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(f"{url}/consumer/marketplace")
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+
+def predict(url, i):
+    # Vary the quantity so the prediction cache does not answer the burst
+    response = requests.post(f"{url}/price-prediction/predict", json={**EXAMPLE_INPUT, "quantity": 100 + i})
+    return response.status_code
+
+
+def measure_marketplace(url, seconds):
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=time_marketplace, args=(url, stop, latencies))
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default="http://localhost:8000", help="Base URL of the running server")
+    parser.add_argument('--requests', type=int, default=2000, help="Number of prediction requests in the burst")
+    parser.add_argument('--concurrency', type=int, default=64, help="Concurrent prediction clients")
+    args = parser.parse_args()
+
+    idle = measure_marketplace(args.url, 2)
+
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=time_marketplace, args=(args.url, stop, latencies))
+    thread.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        statuses = Counter(executor.map(lambda i: predict(args.url, i), range(args.requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+
+    print(format_latencies("marketplace idle", idle))
+    print(format_latencies("marketplace during burst", np.array(latencies)))
+    print(f"burst: {args.requests} predictions in {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s), "
+          f"status codes {dict(statuses)}")
+    print("inference pool:", requests.get(f"{args.url}/price-prediction/stats").json().get("pool"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for access token checks.
+
+For each token store (memory, SQLite in WAL mode, Redis-compatible via the
+in-process LocalRedis stand-in) this issues tokens, then times token checks
+through the read-through TokenCache, both with a warm cache and with the cache
+disabled. It also checks correctness across processes for the SQLite store: a
+token issued by a separate process must be accepted here, and a logout in that
+process must be seen by this process's cache once it reads the change log.
+
+Usage: python benchmarks/bench_token_check.py [--tokens 1000] [--checks 20000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import secrets
+import tempfile
+from datetime import datetime, timedelta
+
+from common import time_calls, format_latencies
+from local_redis import LocalRedis
+
+from auth.token_store import MemoryTokenStore, RedisTokenStore, SQLiteTokenStore, TokenCache
+
+
+def token_data(i):
+    return {"username": f"user{i}", "role": "farmer", "expires": datetime.utcnow() + timedelta(days=1)}
+
+
+def other_process(db_path, action, token):
+    """Issue or revoke a token from a separate process"""
+    store = SQLiteTokenStore(db_path)
+    if action == "issue":
+        store.put(token, token_data(0))
+    else:
+        store.delete(token)
+
+
+def run_in_process(db_path, action, token):
+    process = multiprocessing.get_context("spawn").Process(target=other_process, args=(db_path, action, token))
+    process.start()
+    process.join(60)
+
+
+def check_across_processes(db_path):
+    """Tokens written by another process are seen here, including revocations"""
+    cache = TokenCache(SQLiteTokenStore(db_path))
+    token = secrets.token_hex(32)
+    run_in_process(db_path, "issue", token)
+    issued = cache.get(token) is not None and cache.get(token) is not None
+    run_in_process(db_path, "revoke", token)
+    still_cached = cache.get(token) is not None
+    cache.refresh()
+    revoked = still_cached and cache.get(token) is None
+    return issued and revoked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=1000, help="Number of issued tokens")
+    parser.add_argument('--checks', type=int, default=20000, help="Number of token checks to time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "tokens.db")
+        stores = [
+            ("memory", MemoryTokenStore()),
+            ("sqlite", SQLiteTokenStore(db_path)),
+            ("redis (LocalRedis)", RedisTokenStore(LocalRedis()))
+        ]
+
+        tokens = [secrets.token_hex(32) for _ in range(args.tokens)]
+        checks = [(random.choice(tokens),) for _ in range(args.checks)]
+
+        print(f"{args.tokens} tokens, {args.checks} checks per store\n")
+        for name, store in stores:
+            for i, token in enumerate(tokens):
+                store.put(token, token_data(i))
+            cached = TokenCache(store)
+            uncached = TokenCache(store, max_entries=0)
+            print(format_latencies(f"{name} cached", time_calls(cached.get, checks)))
+            print(format_latencies(f"{name} uncached", time_calls(uncached.get, checks)))
+
+        print(f"\nSQLite store correct across processes: {check_across_processes(db_path)}")
+
+
+if __name__ == "__main__":
+    main()
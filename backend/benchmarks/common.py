@@ -0,0 +1,40 @@
+"""
+Shared helpers for the backend benchmark scripts.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the backend directory to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+DEFAULT_MODEL_DIR = os.path.join(BACKEND_DIR, 'price_prediction', 'models')
+
+
+def load_model(model_dir=DEFAULT_MODEL_DIR):
+    """Load the crop price pipeline and its feature columns"""
+    import joblib
+    model = joblib.load(os.path.join(model_dir, 'crop_price_model.joblib'))
+    feature_columns = joblib.load(os.path.join(model_dir, 'feature_columns.joblib'))
+    return model, feature_columns
+
+
+def time_calls(fn, args_list):
+    """Call fn(*args) for every args tuple and return per-call latencies in ms"""
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def format_latencies(label, latencies):
+    """One-line p50/p99 summary for a latency array in ms"""
+    return (f"{label:<28} p50={np.percentile(latencies, 50):8.3f} ms  "
+            f"p99={np.percentile(latencies, 99):8.3f} ms  "
+            f"mean={latencies.mean():8.3f} ms  n={len(latencies)}")
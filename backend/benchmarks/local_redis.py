@@ -0,0 +1,184 @@
+"""
+In-process stand-in for the Redis client used by RedisTokenStore.
+
+Only for benchmarks and tests: the production token store needs a real Redis
+server (AUTH_REDIS_URL).
+"""
+
+import threading
+import time
+
+
+def as_text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class LocalRedis:
+    """
+    Minimal in-process stand-in for a Redis client.
+
+    Supports the commands RedisTokenStore uses (strings with expiry, sorted
+    sets, a stream, and MULTI/EXEC pipelines), so the store can be exercised
+    without a Redis server. Each instance is private to its process, so it
+    cannot stand in for a shared store in a multi-worker deployment. Like a real client it stores bytes and honours key
+    expiry.
+    """
+
+    def __init__(self):
+        self._data = {}
+        # Reentrant, so a pipeline can hold it across its queued commands
+        self._lock = threading.RLock()
+        self._last_stream_id = (0, 0)
+
+    def pipeline(self, transaction=True):
+        return LocalRedisPipeline(self)
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if key not in self._data:
+                return False
+            self._data[key] = (self._data[key][0], time.monotonic() + seconds)
+            return True
+
+    # Sorted sets, stored as {member: score} dicts
+
+    def _zset(self, key):
+        item = self._data.get(key)
+        if item is None or (item[1] is not None and item[1] <= time.monotonic()):
+            self._data.pop(key, None)
+            return {}
+        return item[0]
+
+    def _ranked(self, key):
+        return sorted(self._zset(key).items(), key=lambda item: (item[1], item[0]))
+
+    @staticmethod
+    def _rank_slice(length, start, end):
+        start = max(start + length if start < 0 else start, 0)
+        end = end + length if end < 0 else min(end, length - 1)
+        return start, max(end + 1, start)
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            zset = self._zset(key)
+            added = sum(1 for member in mapping if member.encode() not in zset)
+            zset.update({member.encode(): float(score) for member, score in mapping.items()})
+            self._data[key] = (zset, self._data.get(key, (None, None))[1])
+            return added
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._zset(key))
+
+    def zrem(self, key, *members):
+        with self._lock:
+            zset = self._zset(key)
+            return sum(1 for member in members if zset.pop(member.encode(), None) is not None)
+
+    def zrange(self, key, start, end):
+        with self._lock:
+            ranked = self._ranked(key)
+            first, stop = self._rank_slice(len(ranked), start, end)
+            return [member for member, _ in ranked[first:stop]]
+
+    def zremrangebyrank(self, key, start, end):
+        with self._lock:
+            members = self.zrange(key, start, end)
+            zset = self._zset(key)
+            for member in members:
+                del zset[member]
+            return len(members)
+
+    def zrangebyscore(self, key, min, max, withscores=False):
+        with self._lock:
+            return [(member, score) if withscores else member
+                    for member, score in self._ranked(key) if float(min) <= score <= float(max)]
+
+    def zremrangebyscore(self, key, min, max):
+        with self._lock:
+            zset = self._zset(key)
+            members = [member for member, score in zset.items() if float(min) <= score <= float(max)]
+            for member in members:
+                del zset[member]
+            return len(members)
+
+    # Streams, stored as lists of (id, fields) with ids "milliseconds-sequence"
+
+    @staticmethod
+    def _stream_id(value):
+        milliseconds, _, sequence = str(as_text(value)).partition("-")
+        return int(milliseconds), int(sequence or 0)
+
+    def xadd(self, key, fields, minid=None, approximate=True):
+        with self._lock:
+            milliseconds = int(time.time() * 1000)
+            last_ms, last_seq = self._last_stream_id
+            stream_id = (milliseconds, 0) if milliseconds > last_ms else (last_ms, last_seq + 1)
+            self._last_stream_id = stream_id
+            entries = self._data.setdefault(key, ([], None))[0]
+            entries.append((f"{stream_id[0]}-{stream_id[1]}".encode(), {
+                name.encode(): value.encode() if isinstance(value, str) else value for name, value in fields.items()
+            }))
+            if minid is not None:
+                oldest = self._stream_id(minid)
+                entries[:] = [entry for entry in entries if self._stream_id(entry[0]) >= oldest]
+            return entries[-1][0]
+
+    def xrange(self, key, min="-", max="+", count=None):
+        with self._lock:
+            entries = self._data.get(key, ([], None))[0]
+            if min != "-":
+                exclusive = as_text(min).startswith("(")
+                low = self._stream_id(as_text(min).lstrip("("))
+                entries = [entry for entry in entries
+                           if self._stream_id(entry[0]) > low or (not exclusive and self._stream_id(entry[0]) == low)]
+            return list(entries[:count] if count else entries)
+
+    def xrevrange(self, key, max="+", min="-", count=None):
+        with self._lock:
+            entries = list(reversed(self._data.get(key, ([], None))[0]))
+            return entries[:count] if count else entries
+
+
+class LocalRedisPipeline:
+    """Queues LocalRedis commands and runs them together, like MULTI/EXEC"""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._client._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import sqlite3
 import os
 from pathlib import Path
 import uuid
 
+from consumer.marketplace_search import search
+from consumer.marketplace_snapshot import MarketplaceSnapshot
+
 # Setup router
 router = APIRouter()
 
@@ -16,6 +20,19 @@ DB_PATH = DB_DIR / "consumer.db"
 # Make sure the directory exists
 os.makedirs(DB_DIR, exist_ok=True)
 
+# The marketplace is served from the farmer's crops database
+FARMER_DB_PATH = Path(__file__).parent.parent / "farmer" / "data" / "farmer.db"
+
+# Served from idx_crops_available_name in farmer.db without touching the table
+MARKETPLACE_QUERY = """
+    SELECT id, name, quantity, unit, price_per_unit, description, location
+    FROM crops 
+    WHERE available = 1
+    ORDER BY name
+"""
+
+marketplace_snapshot = MarketplaceSnapshot(FARMER_DB_PATH, MARKETPLACE_QUERY)
+
 # Define models
 class CartItem(BaseModel):
     id: Optional[int] = None
@@ -83,29 +100,65 @@ def setup_db():
 setup_db()
 
 @router.get("/marketplace", response_model=List[dict])
-async def get_marketplace_products():
-    """Get all products available in the marketplace"""
-    # We'll use the farmer's crops database for the marketplace
-    farmer_db_path = Path(__file__).parent.parent / "farmer" / "data" / "farmer.db"
-    
-    if not os.path.exists(farmer_db_path):
+async def get_marketplace_products(if_none_match: Optional[str] = Header(None)):
+    """
+    Get all products available in the marketplace.
+    
+    Served from a pre-serialized snapshot that is rebuilt only when farmer.db
+    changes. The response carries an ETag; a request whose If-None-Match
+    matches it gets an empty 304 response.
+    """
+    if not os.path.exists(FARMER_DB_PATH):
         return []
     
-    conn = sqlite3.connect(farmer_db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, name, quantity, unit, price_per_unit, description, location
-        FROM crops 
-        WHERE available = 1
-        ORDER BY name
-    """)
-    rows = cursor.fetchall()
-    
-    conn.close()
+    snapshot, not_modified = await marketplace_snapshot.get(if_none_match)
+    # no-cache: clients may keep the catalogue but must revalidate it on every use
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@router.on_event("shutdown")
+async def close_marketplace_snapshot():
+    marketplace_snapshot.close()
+
+def run_marketplace_search(**kwargs):
+    conn = sqlite3.connect(FARMER_DB_PATH)
+    try:
+        return search(conn, **kwargs)
+    finally:
+        conn.close()
+
+@router.get("/marketplace/search")
+async def search_marketplace(
+    q: Optional[str] = Query(None, max_length=200, description="Search words, matched against crop name, description and location"),
+    location: Optional[str] = None,
+    unit: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price per unit"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price per unit"),
+    offset: int = Query(0, ge=0, le=10000, description="Number of results to skip"),
+    limit: int = Query(20, ge=1, le=100, description="Results per page")
+):
+    """
+    Search the marketplace.
+    
+    Returns one page of available crops ranked by relevance to q (or by name
+    without q) and facet counts by location, unit and price bucket over all
+    matching crops.
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_price must not be greater than max_price"
+        )
+    if not os.path.exists(FARMER_DB_PATH):
+        return {"query": q, "total": 0, "offset": offset, "limit": limit, "results": [],
+                "facets": {"location": [], "unit": [], "price": []}}
     
-    return [dict(row) for row in rows]
+    return await asyncio.to_thread(
+        run_marketplace_search, text=q, location=location, unit=unit,
+        min_price=min_price, max_price=max_price, offset=offset, limit=limit
+    )
 
 @router.get("/cart/{cart_id}", response_model=List[CartItem])
 async def get_cart_items(cart_id: str):
@@ -0,0 +1,109 @@
+"""
+Full-text and faceted search over the marketplace.
+
+Searches the crops_fts FTS5 index of farmer.db (crop name, description and
+location, kept in sync with the crops table by triggers; see the farmer.db
+migrations). Every word of the query must match, as a prefix, so partial
+words typed into a search box already find results. Results are ranked
+with bm25, weighting matches in the crop name above the location and the
+description, and paginated with offset/limit.
+
+Facet counts (by location, by unit and by price bucket) are computed over
+all available crops that match the query and filters, in one pass over the
+matching rows.
+"""
+
+import os
+import re
+
+# Upper bounds of the price per unit facet buckets; the last bucket is open-ended
+SEARCH_PRICE_BUCKETS = [float(bound) for bound in os.environ.get("SEARCH_PRICE_BUCKETS", "20,40,60,80,100,150").split(",")]
+
+# bm25 weights of the name, description and location columns
+BM25_WEIGHTS = (10.0, 1.0, 3.0)
+
+RESULT_COLUMNS = "c.id, c.name, c.quantity, c.unit, c.price_per_unit, c.description, c.location"
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query where every word must match as a prefix"""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text or ""))
+
+
+def price_bucket_sql(column):
+    """SQL expression giving the index of the price bucket of column"""
+    cases = " ".join(f"WHEN {column} < {bound!r} THEN {index}" for index, bound in enumerate(SEARCH_PRICE_BUCKETS))
+    return f"CASE {cases} ELSE {len(SEARCH_PRICE_BUCKETS)} END"
+
+
+def search(conn, text=None, location=None, unit=None, min_price=None, max_price=None, offset=0, limit=20):
+    """Ranked page of available crops matching text and the filters, with facet counts"""
+    match = match_expression(text)
+    clauses, params = ["c.available = 1"], []
+    if match:
+        source = "crops_fts JOIN crops c ON c.id = crops_fts.rowid"
+        clauses.insert(0, "crops_fts MATCH ?")
+        params.append(match)
+        score = f"bm25(crops_fts, {', '.join(str(weight) for weight in BM25_WEIGHTS)})"
+        order = "score, c.id"
+    else:
+        # Without search words there is nothing to rank on; browse by name
+        source = "crops c"
+        score = "NULL"
+        order = "c.name, c.id"
+    for column, value in (("c.location", location), ("c.unit", unit)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if min_price is not None:
+        clauses.append("c.price_per_unit >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        clauses.append("c.price_per_unit <= ?")
+        params.append(max_price)
+    where = " AND ".join(clauses)
+
+    rows = conn.execute(
+        f"SELECT {RESULT_COLUMNS}, {score} AS score FROM {source} WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+        (*params, limit, offset)
+    ).fetchall()
+    results = []
+    for row in rows:
+        result = dict(zip(("id", "name", "quantity", "unit", "price_per_unit", "description", "location"), row[:7]))
+        # bm25 is lower for better matches; report a relevance where higher is better
+        result["relevance"] = round(-row[7], 4) if row[7] is not None else None
+        results.append(result)
+
+    facets = {"location": [], "unit": [], "price": []}
+    price_counts = [0] * (len(SEARCH_PRICE_BUCKETS) + 1)
+    for facet, value, count in conn.execute(
+        f"""
+        WITH matches AS MATERIALIZED (SELECT c.location, c.unit, c.price_per_unit FROM {source} WHERE {where})
+        SELECT 'location', location, COUNT(*) FROM matches GROUP BY location
+        UNION ALL
+        SELECT 'unit', unit, COUNT(*) FROM matches GROUP BY unit
+        UNION ALL
+        SELECT 'price', {price_bucket_sql('price_per_unit')}, COUNT(*) FROM matches GROUP BY 2
+        """,
+        params
+    ):
+        if facet == "price":
+            price_counts[value] = count
+        else:
+            facets[facet].append({"value": value, "count": count})
+    for facet in ("location", "unit"):
+        facets[facet].sort(key=lambda entry: -entry["count"])
+    bounds = [None, *SEARCH_PRICE_BUCKETS, None]
+    facets["price"] = [
+        {"min": bounds[index], "max": bounds[index + 1], "count": count}
+        for index, count in enumerate(price_counts)
+    ]
+
+    return {
+        "query": text,
+        "total": sum(entry["count"] for entry in facets["unit"]),
+        "offset": offset,
+        "limit": limit,
+        "results": results,
+        "facets": facets
+    }
@@ -0,0 +1,112 @@
+"""
+Process-level snapshot of the marketplace catalogue.
+
+The catalogue is read far more often than farmers change it. Instead of
+querying farmer.db and serializing every available crop for each visitor,
+MarketplaceSnapshot keeps the serialized JSON body and an ETag (a hash of
+the body) and rebuilds them only when farmer.db has changed.
+
+Changes are detected with PRAGMA data_version on a connection kept open by
+the snapshot: its value changes whenever another connection (any endpoint,
+worker process or script) commits to the database, and reading it does not
+run a query. Clients that send the current ETag in If-None-Match get a 304
+without any query or JSON work.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+
+
+class Snapshot:
+    def __init__(self, version, body, etag, rows, build_seconds):
+        self.version = version
+        self.body = body
+        self.etag = etag
+        self.rows = rows
+        self.build_seconds = build_seconds
+
+
+def etag_matches(if_none_match, etag):
+    """True when an If-None-Match header value matches the ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class MarketplaceSnapshot:
+    """Serialized result of the marketplace query, rebuilt when the database changes"""
+
+    def __init__(self, db_path, query):
+        self.db_path = db_path
+        self.query = query
+        self._conn = None
+        self._snapshot = None
+        # Serializes use of the connection; requests that find the snapshot
+        # stale while it is being rebuilt wait for that rebuild
+        self._lock = asyncio.Lock()
+
+        self.hits = 0
+        self.not_modified = 0
+        self.rebuilds = 0
+
+    def _data_version(self):
+        if self._conn is None:
+            # Used from the event loop and from the rebuild thread, never at the same time
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _build(self):
+        start = time.perf_counter()
+        version = self._data_version()
+        cursor = self._conn.execute(self.query)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        # Same encoding as FastAPI's JSONResponse
+        body = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        return Snapshot(version, body, etag, len(rows), time.perf_counter() - start)
+
+    async def get(self, if_none_match=None):
+        """
+        Return (snapshot, not_modified) for a request.
+
+        The snapshot is rebuilt first if farmer.db changed since it was built;
+        not_modified is True when if_none_match matches the snapshot's ETag.
+        """
+        async with self._lock:
+            if self._snapshot is None or self._data_version() != self._snapshot.version:
+                self._snapshot = await asyncio.to_thread(self._build)
+                self.rebuilds += 1
+            snapshot = self._snapshot
+
+        if etag_matches(if_none_match, snapshot.etag):
+            self.not_modified += 1
+            return snapshot, True
+        self.hits += 1
+        return snapshot, False
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "rows": snapshot.rows if snapshot else 0,
+            "bytes": len(snapshot.body) if snapshot else 0,
+            "etag": snapshot.etag if snapshot else None,
+            "last_build_ms": round(snapshot.build_seconds * 1000, 2) if snapshot else None,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "rebuilds": self.rebuilds
+        }
@@ -0,0 +1,224 @@
+"""
+Incrementally maintained aggregates for the farmer dashboard statistics.
+
+GET /farmer/dashboard/stats used to count and sum the whole crops table on
+every call. Instead, summary tables hold the totals of the whole platform
+and of each farmer:
+
+    platform_crop_stats       (one row) total_crops, total_quantity, total_value
+    platform_crop_type_stats  name -> count
+    crop_stats                farmer_id -> total_crops, total_quantity, total_value
+    crop_type_stats           (farmer_id, name) -> count
+
+SQLite triggers on crops apply every insert, update and delete to them as
+deltas inside the same transaction, so they stay in step with the table
+whichever code path writes the crops, and reading the stats is a primary
+key lookup. check_stats() recomputes everything from the crops table,
+compares, and rebuilds the summary tables if they disagree.
+
+Run a check from the command line with: python farmer/crop_stats.py [--repair]
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import time
+
+# Relative tolerance when comparing maintained sums with recomputed ones
+SUM_TOLERANCE = 1e-9
+
+
+def _apply_row(row, sign):
+    """SQL adding (sign "+") or removing (sign "-") one crops row (NEW or OLD) to the platform and its farmer"""
+    return f"""
+        UPDATE platform_crop_stats SET
+            total_crops = total_crops {sign} 1,
+            total_quantity = total_quantity {sign} {row}.quantity,
+            total_value = total_value {sign} {row}.quantity * {row}.price_per_unit;
+        INSERT INTO platform_crop_type_stats (name, count) VALUES ({row}.name, {sign}1)
+        ON CONFLICT (name) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO crop_stats (farmer_id, total_crops, total_quantity, total_value)
+        SELECT {row}.farmer_id, {sign}1, {sign}{row}.quantity, {sign}{row}.quantity * {row}.price_per_unit
+        WHERE {row}.farmer_id IS NOT NULL
+        ON CONFLICT (farmer_id) DO UPDATE SET
+            total_crops = total_crops + excluded.total_crops,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_value = total_value + excluded.total_value;
+        INSERT INTO crop_type_stats (farmer_id, name, count)
+        SELECT {row}.farmer_id, {row}.name, {sign}1 WHERE {row}.farmer_id IS NOT NULL
+        ON CONFLICT (farmer_id, name) DO UPDATE SET count = count + excluded.count;"""
+
+
+# Drops the entries a removed row leaves empty, and clears the rounding
+# residue of the platform sums once it has no crops
+_PRUNE_OLD = """
+        DELETE FROM platform_crop_type_stats WHERE name = OLD.name AND count <= 0;
+        DELETE FROM crop_type_stats WHERE farmer_id = OLD.farmer_id AND name = OLD.name AND count <= 0;
+        DELETE FROM crop_stats WHERE farmer_id = OLD.farmer_id AND total_crops <= 0;
+        UPDATE platform_crop_stats SET total_quantity = 0, total_value = 0 WHERE total_crops = 0;"""
+
+# Recomputed totals: (farmer_id, total_crops, total_quantity, total_value) and
+# (farmer_id, name, count), with a NULL farmer_id for the platform
+EXPECTED_TOTALS_QUERY = """
+    SELECT NULL, COUNT(*), IFNULL(SUM(quantity), 0), IFNULL(SUM(quantity * price_per_unit), 0) FROM crops
+    UNION ALL
+    SELECT farmer_id, COUNT(*), SUM(quantity), SUM(quantity * price_per_unit)
+    FROM crops WHERE farmer_id IS NOT NULL GROUP BY farmer_id"""
+EXPECTED_COUNTS_QUERY = """
+    SELECT NULL, name, COUNT(*) FROM crops GROUP BY name
+    UNION ALL
+    SELECT farmer_id, name, COUNT(*) FROM crops WHERE farmer_id IS NOT NULL GROUP BY farmer_id, name"""
+
+# The same, as stored in the summary tables
+STORED_TOTALS_QUERY = """
+    SELECT NULL, total_crops, total_quantity, total_value FROM platform_crop_stats
+    UNION ALL
+    SELECT farmer_id, total_crops, total_quantity, total_value FROM crop_stats"""
+STORED_COUNTS_QUERY = """
+    SELECT NULL, name, count FROM platform_crop_type_stats
+    UNION ALL
+    SELECT farmer_id, name, count FROM crop_type_stats"""
+
+REBUILD_STATS_SQL = """
+    DELETE FROM platform_crop_stats;
+    DELETE FROM platform_crop_type_stats;
+    DELETE FROM crop_stats;
+    DELETE FROM crop_type_stats;
+    INSERT INTO platform_crop_stats (id, total_crops, total_quantity, total_value)
+        SELECT 1, COUNT(*), IFNULL(SUM(quantity), 0), IFNULL(SUM(quantity * price_per_unit), 0) FROM crops;
+    INSERT INTO platform_crop_type_stats (name, count)
+        SELECT name, COUNT(*) FROM crops GROUP BY name;
+    INSERT INTO crop_stats (farmer_id, total_crops, total_quantity, total_value)
+        SELECT farmer_id, COUNT(*), SUM(quantity), SUM(quantity * price_per_unit)
+        FROM crops WHERE farmer_id IS NOT NULL GROUP BY farmer_id;
+    INSERT INTO crop_type_stats (farmer_id, name, count)
+        SELECT farmer_id, name, COUNT(*) FROM crops WHERE farmer_id IS NOT NULL GROUP BY farmer_id, name;
+"""
+
+# Schema migration creating the summary tables and triggers and filling them
+STATS_MIGRATION = f"""
+    CREATE TABLE platform_crop_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_crops INTEGER NOT NULL DEFAULT 0,
+        total_quantity REAL NOT NULL DEFAULT 0,
+        total_value REAL NOT NULL DEFAULT 0
+    );
+    CREATE TABLE platform_crop_type_stats (
+        name TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    CREATE TABLE crop_stats (
+        farmer_id INTEGER PRIMARY KEY,
+        total_crops INTEGER NOT NULL DEFAULT 0,
+        total_quantity REAL NOT NULL DEFAULT 0,
+        total_value REAL NOT NULL DEFAULT 0
+    );
+    CREATE TABLE crop_type_stats (
+        farmer_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (farmer_id, name)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER crops_stats_insert AFTER INSERT ON crops
+    BEGIN{_apply_row("NEW", "+")}
+    END;
+    CREATE TRIGGER crops_stats_delete AFTER DELETE ON crops
+    BEGIN{_apply_row("OLD", "-")}{_PRUNE_OLD}
+    END;
+    CREATE TRIGGER crops_stats_update AFTER UPDATE OF name, quantity, price_per_unit, farmer_id ON crops
+    BEGIN{_apply_row("OLD", "-")}{_PRUNE_OLD}{_apply_row("NEW", "+")}
+    END;
+    {REBUILD_STATS_SQL}
+"""
+
+
+def read_stats(conn, farmer_id=None):
+    """Dashboard statistics of one farmer, or of the whole platform when farmer_id is None"""
+    if farmer_id is None:
+        row = conn.execute("SELECT total_crops, total_quantity, total_value FROM platform_crop_stats").fetchone()
+        type_counts = conn.execute("SELECT name, count FROM platform_crop_type_stats ORDER BY count DESC")
+    else:
+        row = conn.execute(
+            "SELECT total_crops, total_quantity, total_value FROM crop_stats WHERE farmer_id = ?", (farmer_id,)
+        ).fetchone()
+        type_counts = conn.execute(
+            "SELECT name, count FROM crop_type_stats WHERE farmer_id = ? ORDER BY count DESC", (farmer_id,)
+        )
+    total_crops, total_quantity, total_value = row or (0, 0, 0)
+    return {
+        "total_crops": total_crops,
+        "total_quantity": total_quantity,
+        "total_value": total_value,
+        "crops_by_type": [{"name": name, "count": count} for name, count in type_counts]
+    }
+
+
+def _stats_tables(conn, crop_stats_query, crop_type_stats_query):
+    totals = {row[0]: row[1:] for row in conn.execute(crop_stats_query)}
+    counts = {(row[0], row[1]): row[2] for row in conn.execute(crop_type_stats_query)}
+    return totals, counts
+
+
+def check_stats(conn, repair=False):
+    """
+    Recompute the statistics from the crops table and compare them with the summary tables.
+
+    Both are read in one transaction, so they come from the same snapshot.
+    With repair=True, the summary tables are rebuilt when they disagree.
+    Returns a report with the mismatches found (at most 20 are listed); the
+    platform totals are reported with a farmer_id of None.
+    """
+    start = time.perf_counter()
+    conn.execute("BEGIN")
+    try:
+        stored = _stats_tables(conn, STORED_TOTALS_QUERY, STORED_COUNTS_QUERY)
+        expected = _stats_tables(conn, EXPECTED_TOTALS_QUERY, EXPECTED_COUNTS_QUERY)
+    finally:
+        conn.execute("COMMIT")
+
+    mismatches = []
+    (stored_totals, stored_counts), (expected_totals, expected_counts) = stored, expected
+    for farmer_id in stored_totals.keys() | expected_totals.keys():
+        have, want = stored_totals.get(farmer_id), expected_totals.get(farmer_id)
+        if (have is None or want is None or have[0] != want[0]
+                or not all(math.isclose(a, b, rel_tol=SUM_TOLERANCE, abs_tol=SUM_TOLERANCE) for a, b in zip(have[1:], want[1:]))):
+            mismatches.append({"table": "crop_stats", "farmer_id": farmer_id, "stored": have, "expected": want})
+    for key in stored_counts.keys() | expected_counts.keys():
+        if stored_counts.get(key) != expected_counts.get(key):
+            mismatches.append({"table": "crop_type_stats", "farmer_id": key[0], "name": key[1],
+                               "stored": stored_counts.get(key), "expected": expected_counts.get(key)})
+
+    repaired = False
+    if mismatches and repair:
+        conn.executescript(f"BEGIN IMMEDIATE; {REBUILD_STATS_SQL} COMMIT;")
+        repaired = True
+
+    return {
+        "consistent": not mismatches,
+        "mismatch_count": len(mismatches),
+        "mismatches": mismatches[:20],
+        "repaired": repaired,
+        "farmers": len(expected_totals) - 1,
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the farmer dashboard aggregates against the crops table")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "farmer.db"),
+                        help="Farmer database (default: farmer/data/farmer.db)")
+    parser.add_argument("--repair", action="store_true", help="Rebuild the aggregates if they disagree")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    report = check_stats(conn, repair=args.repair)
+    conn.close()
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["consistent"] or report["repaired"] else 1)
+
+
+if __name__ == "__main__":
+    main()
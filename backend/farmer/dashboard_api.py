@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, status
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Path as PathParam, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
+import asyncio
+import base64
+import binascii
+import csv
+import io
+import json
 import sqlite3
 import os
 from pathlib import Path
 
+from farmer.crop_stats import STATS_MIGRATION, check_stats, read_stats
+from utils.request_rows import read_rows, validate_rows
+
 # Setup router
 router = APIRouter()
 
@@ -15,6 +25,87 @@ DB_PATH = DB_DIR / "farmer.db"
 # Make sure the directory exists
 os.makedirs(DB_DIR, exist_ok=True)
 
+# Schema migrations, applied in order on startup. PRAGMA user_version records
+# how many have been applied, so each one runs exactly once per database.
+MIGRATIONS = [
+    # 1: indexes for the listing, marketplace and dashboard stats queries.
+    # The marketplace index covers every column the marketplace returns and
+    # idx_crops_name covers the stats aggregates, so neither reads the table.
+    '''
+    CREATE INDEX IF NOT EXISTS idx_crops_created_at ON crops (created_at);
+    CREATE INDEX IF NOT EXISTS idx_crops_available_name
+        ON crops (available, name, quantity, unit, price_per_unit, description, location);
+    CREATE INDEX IF NOT EXISTS idx_crops_name ON crops (name, quantity, price_per_unit);
+    ''',
+    # 2: keyset pagination of the crop listing. Each equality filter has an
+    # index ordered by created_at, so a filtered page is read in order from
+    # the cursor onwards; price ranges are checked on the rows read.
+    '''
+    CREATE INDEX IF NOT EXISTS idx_crops_farmer_created ON crops (farmer_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_crops_name_created ON crops (name, created_at);
+    CREATE INDEX IF NOT EXISTS idx_crops_location_created ON crops (location, created_at);
+    CREATE INDEX IF NOT EXISTS idx_crops_available_created ON crops (available, created_at);
+    ''',
+    # 3: dashboard statistics kept up to date by triggers, with the platform
+    # totals in their own tables (see crop_stats.py)
+    STATS_MIGRATION,
+    # 4: a farmer's own listings filtered by crop name, in listing order
+    '''
+    CREATE INDEX IF NOT EXISTS idx_crops_farmer_name ON crops (farmer_id, name, created_at);
+    ''',
+    # 5: full-text index of crop name, description and location for the
+    # marketplace search. It is an external-content FTS5 table (the text
+    # stays in crops only), kept in sync by triggers; prefix indexes make
+    # search-as-you-type prefix queries cheap.
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS crops_fts USING fts5(
+        name, description, location,
+        content='crops', content_rowid='id', prefix='2 3'
+    );
+    CREATE TRIGGER IF NOT EXISTS crops_fts_insert AFTER INSERT ON crops
+    BEGIN
+        INSERT INTO crops_fts (rowid, name, description, location)
+        VALUES (NEW.id, NEW.name, NEW.description, NEW.location);
+    END;
+    CREATE TRIGGER IF NOT EXISTS crops_fts_delete AFTER DELETE ON crops
+    BEGIN
+        INSERT INTO crops_fts (crops_fts, rowid, name, description, location)
+        VALUES ('delete', OLD.id, OLD.name, OLD.description, OLD.location);
+    END;
+    CREATE TRIGGER IF NOT EXISTS crops_fts_update AFTER UPDATE OF name, description, location ON crops
+    BEGIN
+        INSERT INTO crops_fts (crops_fts, rowid, name, description, location)
+        VALUES ('delete', OLD.id, OLD.name, OLD.description, OLD.location);
+        INSERT INTO crops_fts (rowid, name, description, location)
+        VALUES (NEW.id, NEW.name, NEW.description, NEW.location);
+    END;
+    INSERT INTO crops_fts (crops_fts) VALUES ('rebuild');
+    ''',
+]
+
+# Page size of GET /farmer when no limit is given, and the largest allowed limit
+FARMER_PAGE_SIZE = int(os.environ.get("FARMER_PAGE_SIZE", "100"))
+FARMER_MAX_PAGE_SIZE = int(os.environ.get("FARMER_MAX_PAGE_SIZE", "1000"))
+
+# Rows fetched from SQLite per chunk of a streamed export
+FARMER_EXPORT_CHUNK_ROWS = int(os.environ.get("FARMER_EXPORT_CHUNK_ROWS", "1000"))
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Maximum number of listings accepted by /farmer/bulk in a single call
+FARMER_MAX_BULK_ROWS = int(os.environ.get("FARMER_MAX_BULK_ROWS", "10000"))
+
+# Largest number of host parameters used in one IN (...) query
+SQL_VARIABLES = 900
+
+# Seconds between consistency checks of the dashboard statistics (0 disables them)
+FARMER_STATS_CHECK_INTERVAL = float(os.environ.get("FARMER_STATS_CHECK_INTERVAL", "3600"))
+
+# Listing order; id breaks ties between crops created in the same second
+ALL_CROPS_QUERY = "SELECT * FROM crops ORDER BY created_at DESC, id DESC"
+
+stats_checker = None
+
 # Define models
 class CropListing(BaseModel):
     id: Optional[int] = None
@@ -25,13 +116,70 @@ class CropListing(BaseModel):
     description: Optional[str] = None
     location: Optional[str] = None
     available: bool = True
-    farmer_id: Optional[int] = None
+    farmer_id: Optional[int] = Field(None, gt=0)
 
-def setup_db():
-    """Set up the farmer database"""
-    conn = sqlite3.connect(DB_PATH)
+class CropPage(BaseModel):
+    items: List[CropListing]
+    limit: int
+    next_cursor: Optional[str] = None
+
+class BulkCropResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkCropResponse(BaseModel):
+    count: int
+    succeeded: int
+    failed: int
+    results: List[BulkCropResult]
+
+def script_statements(script):
+    """Split a migration script into its statements (trigger bodies stay whole)"""
+    statements, statement = [], ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            statements.append(statement.strip())
+            statement = ""
+    return [statement for statement in statements if statement != ";"]
+
+def migrate(conn):
+    """
+    Apply pending schema migrations and refresh the planner statistics.
+    
+    Each migration runs in its own BEGIN IMMEDIATE transaction, which re-reads
+    user_version once it holds the write lock, so workers starting at the same
+    time apply every migration once between them.
+    """
+    applied = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.execute("COMMIT")
+                break
+            for statement in script_statements(MIGRATIONS[version]):
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        applied += 1
+        print(f"Applied farmer.db migration {version + 1}")
+    if applied:
+        conn.execute("ANALYZE")
+
+def setup_db(db_path=None):
+    """Set up the farmer database (run at startup, and by scripts for their own databases)"""
+    conn = sqlite3.connect(db_path or DB_PATH, isolation_level=None)
     cursor = conn.cursor()
     
+    # WAL lets long reads (exports) run without blocking writers
+    cursor.execute("PRAGMA journal_mode=WAL")
+    
     # Create crops table
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS crops (
@@ -48,7 +196,10 @@ def setup_db():
     )
     ''')
     
+    migrate(conn)
+    
     # Add some sample crops if none exist
+    cursor.execute("BEGIN IMMEDIATE")
     cursor.execute("SELECT COUNT(*) FROM crops")
     count = cursor.fetchone()[0]
     
@@ -66,27 +217,312 @@ def setup_db():
             sample_crops
         )
         
-        conn.commit()
         print("Added sample crop listings")
+    cursor.execute("COMMIT")
     
+    # Re-analyze tables whose statistics are stale (e.g. the table has grown a lot)
+    conn.execute("PRAGMA optimize")
     conn.close()
 
-# Set up the database on module import
-setup_db()
+def crop_filters(farmer_id=None, name=None, location=None, available=None, min_price=None, max_price=None):
+    """Build the WHERE clauses and parameters for the crop listing filters"""
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_price must not be greater than max_price"
+        )
+    
+    clauses, params = [], []
+    for column, value in (("farmer_id", farmer_id), ("name", name), ("location", location)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if available is not None:
+        clauses.append("available = ?")
+        params.append(1 if available else 0)
+    if min_price is not None:
+        clauses.append("price_per_unit >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        clauses.append("price_per_unit <= ?")
+        params.append(max_price)
+    return clauses, params
+
+def encode_cursor(crop):
+    """Opaque page cursor holding the (created_at, id) of the last crop of a page"""
+    return base64.urlsafe_b64encode(json.dumps([crop["created_at"], crop["id"]]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """(created_at, id) from a page cursor; raises a 400 for a cursor we did not issue"""
+    try:
+        created_at, crop_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(created_at, str) or not isinstance(crop_id, int):
+            raise ValueError(cursor)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor; pass the next_cursor of the previous page"
+        )
+    return created_at, crop_id
 
-@router.get("/", response_model=List[CropListing])
-async def get_all_crops():
-    """Get all crop listings"""
+def crop_page(conn, clauses, params, cursor, limit):
+    """
+    Fetch one page of crops, newest first, starting after the page cursor.
+    
+    Keyset pagination: the cursor's (created_at, id) bounds the index scan,
+    so every page costs the same no matter how deep into the listing it is.
+    The cursor carries its own position, so it stays valid even if the crop
+    it was taken from has since been deleted.
+    """
+    clauses, params = list(clauses), list(params)
+    if cursor is not None:
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    # One extra row tells whether there is a next page
+    rows = conn.execute(
+        f"SELECT * FROM crops {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*params, limit + 1)
+    ).fetchall()
+    
+    items = [dict(row) for row in rows[:limit]]
+    return {
+        "items": items,
+        "limit": limit,
+        "next_cursor": encode_cursor(items[-1]) if len(rows) > limit else None
+    }
+
+@router.get("/", response_model=CropPage)
+async def get_all_crops(
+    cursor: Optional[str] = Query(None, max_length=200, description="Return the page after this cursor (next_cursor of the previous page)"),
+    limit: int = Query(FARMER_PAGE_SIZE, ge=1, le=FARMER_MAX_PAGE_SIZE, description="Crops per page"),
+    farmer_id: Optional[int] = Query(None, gt=0),
+    name: Optional[str] = None,
+    location: Optional[str] = None,
+    available: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price per unit"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price per unit")
+):
+    """Get a page of crop listings, newest first"""
+    clauses, params = crop_filters(farmer_id, name, location, available, min_price, max_price)
+    
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    try:
+        return crop_page(conn, clauses, params, cursor, limit)
+    finally:
+        conn.close()
+
+@router.get("/farmers/{farmer_id}/crops", response_model=CropPage)
+async def get_farmer_crops(
+    farmer_id: int = PathParam(..., gt=0),
+    cursor: Optional[str] = Query(None, max_length=200, description="Return the page after this cursor (next_cursor of the previous page)"),
+    limit: int = Query(FARMER_PAGE_SIZE, ge=1, le=FARMER_MAX_PAGE_SIZE, description="Crops per page"),
+    name: Optional[str] = None,
+    location: Optional[str] = None,
+    available: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price per unit"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price per unit")
+):
+    """Get a page of one farmer's crop listings, newest first"""
+    return await get_all_crops(cursor, limit, farmer_id, name, location, available, min_price, max_price)
+
+@router.get("/farmers/{farmer_id}/dashboard/stats")
+async def get_farmer_dashboard_stats(farmer_id: int = PathParam(..., gt=0)):
+    """Get the dashboard statistics of one farmer"""
+    return await get_dashboard_stats(farmer_id)
+
+def export_rows(db_path, clauses, params, fmt, chunk_rows):
+    """
+    Yield the matching crops as NDJSON or CSV text, one chunk of rows at a time.
     
-    cursor.execute("SELECT * FROM crops ORDER BY created_at DESC")
-    rows = cursor.fetchall()
+    Rows are read with fetchmany from a cursor in listing order (which the
+    indexes return without a sort), so the first chunk is sent as soon as it is
+    read and memory use does not grow with the size of the table.
+    """
+    # The generator is resumed on threadpool threads, one at a time
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    try:
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = conn.execute(f"SELECT * FROM crops {where} ORDER BY created_at DESC, id DESC", params)
+        columns = [column[0] for column in cursor.description]
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer is not None:
+            writer.writerow(columns)
+        
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            if writer is not None:
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    record = dict(zip(columns, row))
+                    record["available"] = bool(record["available"])
+                    buffer.write(json.dumps(record))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        # A CSV export with no matching rows still gets its header
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        conn.close()
+
+@router.get("/export")
+async def export_crops(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    farmer_id: Optional[int] = Query(None, gt=0),
+    name: Optional[str] = None,
+    location: Optional[str] = None,
+    available: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price per unit"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price per unit")
+):
+    """Stream all matching crop listings, newest first, as NDJSON or CSV"""
+    clauses, params = crop_filters(farmer_id, name, location, available, min_price, max_price)
     
-    conn.close()
+    return StreamingResponse(
+        export_rows(DB_PATH, clauses, params, format, FARMER_EXPORT_CHUNK_ROWS),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="crops.{format}"'}
+    )
+
+async def read_bulk_listings(request: Request):
+    """
+    Parse and validate the body of a bulk request in one pass.
+    
+    The body is a JSON array of CropListing objects or, with an NDJSON content
+    type, one object per line. Returns (results, valid) where results has an
+    error entry for every invalid row (None for the others) and valid is a
+    list of (index, CropListing).
+    """
+    raw_rows = await read_rows(request, FARMER_MAX_BULK_ROWS, "crop listings")
+    return validate_rows(raw_rows, CropListing)
+
+def bulk_response(results):
+    failed = sum(1 for result in results if result.get("error") is not None)
+    return {
+        "count": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+
+def insert_crops(crops):
+    """Insert crop listings with one executemany in one transaction; returns their ids"""
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """
+                INSERT INTO crops (name, quantity, unit, price_per_unit, description, location, available, farmer_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (crop.name, crop.quantity, crop.unit, crop.price_per_unit, crop.description,
+                     crop.location, 1 if crop.available else 0, crop.farmer_id or 1)
+                    for crop in crops
+                ]
+            )
+            # The write lock is held and ids are AUTOINCREMENT, so the new ids
+            # are the consecutive range ending at the last inserted one
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return list(range(last_id - len(crops) + 1, last_id + 1))
+
+def update_crops(crops):
+    """Update crop listings with one executemany in one transaction; returns the ids that exist"""
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = list({crop.id for crop in crops})
+            existing = set()
+            for i in range(0, len(ids), SQL_VARIABLES):
+                chunk = ids[i:i + SQL_VARIABLES]
+                existing.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM crops WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+            conn.executemany(
+                """
+                UPDATE crops
+                SET name = ?, quantity = ?, unit = ?, price_per_unit = ?,
+                    description = ?, location = ?, available = ?
+                WHERE id = ?
+                """,
+                [
+                    (crop.name, crop.quantity, crop.unit, crop.price_per_unit, crop.description,
+                     crop.location, 1 if crop.available else 0, crop.id)
+                    for crop in crops if crop.id in existing
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return existing
+
+@router.post("/bulk", response_model=BulkCropResponse)
+async def create_crops_bulk(request: Request):
+    """
+    Create many crop listings in one call.
+    
+    Accepts a JSON array of CropListing objects or NDJSON (one per line, with
+    Content-Type: application/x-ndjson). Valid listings are written in a
+    single transaction; results are returned in input order with the new id,
+    or an error for rows that failed validation.
+    """
+    results, valid = await read_bulk_listings(request)
+    
+    if valid:
+        ids = await asyncio.to_thread(insert_crops, [crop for _, crop in valid])
+        for (index, _), crop_id in zip(valid, ids):
+            results[index] = {"index": index, "id": crop_id}
+    
+    return bulk_response(results)
+
+@router.put("/bulk", response_model=BulkCropResponse)
+async def update_crops_bulk(request: Request):
+    """
+    Update many crop listings in one call.
     
-    return [dict(row) for row in rows]
+    Same body format as POST /farmer/bulk; every listing needs its id. All
+    updates are written in a single transaction; rows without an id, that
+    failed validation or whose crop does not exist get an error.
+    """
+    results, valid = await read_bulk_listings(request)
+    
+    updates = []
+    for index, crop in valid:
+        if crop.id is None:
+            results[index] = {"index": index, "error": "id: Field required for an update"}
+        else:
+            updates.append((index, crop))
+    
+    if updates:
+        existing = await asyncio.to_thread(update_crops, [crop for _, crop in updates])
+        for index, crop in updates:
+            if crop.id in existing:
+                results[index] = {"index": index, "id": crop.id}
+            else:
+                results[index] = {"index": index, "id": crop.id, "error": "Crop not found"}
+    
+    return bulk_response(results)
 
 @router.get("/{crop_id}", response_model=CropListing)
 async def get_crop(crop_id: int):
@@ -211,32 +647,41 @@ async def delete_crop(crop_id: int):
     return {"message": "Crop deleted successfully"}
 
 @router.get("/dashboard/stats")
-async def get_dashboard_stats():
-    """Get statistics for the farmer dashboard"""
+async def get_dashboard_stats(farmer_id: Optional[int] = Query(None, gt=0)):
+    """Get statistics for the farmer dashboard, for the whole platform or one farmer"""
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Get total number of crops
-    cursor.execute("SELECT COUNT(*) FROM crops")
-    total_crops = cursor.fetchone()[0]
-    
-    # Get total quantity of all crops
-    cursor.execute("SELECT SUM(quantity) FROM crops")
-    total_quantity = cursor.fetchone()[0] or 0
-    
-    # Get total value of all crops
-    cursor.execute("SELECT SUM(quantity * price_per_unit) FROM crops")
-    total_value = cursor.fetchone()[0] or 0
-    
-    # Get crops grouped by type with count
-    cursor.execute("SELECT name, COUNT(*) as count FROM crops GROUP BY name ORDER BY count DESC")
-    crops_by_type = [{"name": row[0], "count": row[1]} for row in cursor.fetchall()]
-    
-    conn.close()
-    
-    return {
-        "total_crops": total_crops,
-        "total_quantity": total_quantity,
-        "total_value": total_value,
-        "crops_by_type": crops_by_type
-    } 
\ No newline at end of file
+    try:
+        return read_stats(conn, farmer_id)
+    finally:
+        conn.close()
+
+def run_stats_check():
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        report = check_stats(conn, repair=True)
+    finally:
+        conn.close()
+    if not report["consistent"]:
+        print(f"Dashboard statistics were inconsistent and have been rebuilt: {report['mismatches']}")
+    return report
+
+async def check_stats_periodically():
+    """Periodically recompute the dashboard statistics from scratch and repair any drift"""
+    while True:
+        await asyncio.sleep(FARMER_STATS_CHECK_INTERVAL)
+        try:
+            await asyncio.to_thread(run_stats_check)
+        except Exception as e:
+            print(f"Dashboard statistics check failed: {e}")
+
+@router.on_event("startup")
+async def start_stats_checker():
+    global stats_checker
+    await asyncio.to_thread(setup_db)
+    if FARMER_STATS_CHECK_INTERVAL > 0:
+        stats_checker = asyncio.create_task(check_stats_periodically())
+
+@router.on_event("shutdown")
+async def stop_stats_checker():
+    if stats_checker is not None:
+        stats_checker.cancel()
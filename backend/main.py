@@ -46,6 +46,11 @@ app.include_router(auth_router, prefix="/auth", tags=["authentication"])
 # Mount the price prediction API
 app.mount("/price-prediction", price_prediction_app)
 
+# Mounted apps do not receive startup/shutdown events, so run the price
+# prediction handlers (model loading, inference pool) from the main app
+app.router.on_startup.extend(price_prediction_app.router.on_startup)
+app.router.on_shutdown.extend(price_prediction_app.router.on_shutdown)
+
 # Include the new dashboard routers if available
 if farmer_module_available:
     app.include_router(farmer_router, prefix="/farmer", tags=["farmer"])
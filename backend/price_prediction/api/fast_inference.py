@@ -0,0 +1,81 @@
+"""
+Fast single-row inference for the crop price pipeline.
+
+The saved model is a Pipeline(ColumnTransformer(StandardScaler, OneHotEncoder)
+-> RandomForestRegressor). Running it on one row means building a pandas
+DataFrame and letting the ColumnTransformer look up columns by name, which
+costs more than the forest itself. FastRowPredictor applies the fitted scaler
+and one-hot encoder directly into a preallocated feature vector and hands that
+to the regressor, giving identical predictions without pandas.
+"""
+
+import threading
+
+import numpy as np
+
+
+class FastRowPredictor:
+    """Single-row predictor built from a fitted crop price pipeline"""
+
+    def __init__(self, model, feature_columns):
+        self.numeric_features = list(feature_columns['numeric_features'])
+        self.categorical_features = list(feature_columns['categorical_features'])
+
+        preprocessor = model.named_steps['preprocessor']
+        self.regressor = model.named_steps['regressor']
+
+        # Only the layout produced by train_model() is supported; anything else
+        # raises so the caller can fall back to the DataFrame path.
+        transformers = [(name, columns) for name, _, columns in preprocessor.transformers_
+                        if name != 'remainder']
+        if transformers != [('num', self.numeric_features), ('cat', self.categorical_features)]:
+            raise ValueError("Preprocessor layout does not match feature_columns")
+        if preprocessor.transformers_[-1][0] == 'remainder' and preprocessor.transformers_[-1][1] != 'drop':
+            raise ValueError("Preprocessor remainder columns are not supported")
+
+        scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+        onehot = preprocessor.named_transformers_['cat'].named_steps['onehot']
+        if onehot.drop is not None or getattr(onehot, 'infrequent_categories_', None) is not None:
+            raise ValueError("One-hot encoders with dropped or infrequent categories are not supported")
+
+        n_numeric = len(self.numeric_features)
+        self.mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_numeric)
+        self.scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_numeric)
+
+        # Map every known category to its column in the encoded feature vector
+        self.category_offsets = []
+        offset = n_numeric
+        for categories in onehot.categories_:
+            self.category_offsets.append({value: offset + i for i, value in enumerate(categories)})
+            offset += len(categories)
+        self.n_features = offset
+
+        if self.n_features != self.regressor.n_features_in_:
+            raise ValueError("Encoded feature count does not match the regressor")
+
+        self._local = threading.local()
+
+    def _buffer(self):
+        """Per-thread preallocated (1, n_features) input vector"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.zeros((1, self.n_features), dtype=np.float64)
+            self._local.buffer = buffer
+        return buffer
+
+    def encode(self, record, out):
+        """Write the scaled and one-hot encoded record into out[0]"""
+        row = out[0]
+        row[:] = 0.0
+        for i, column in enumerate(self.numeric_features):
+            row[i] = (float(record[column]) - self.mean[i]) / self.scale[i]
+        for offsets, column in zip(self.category_offsets, self.categorical_features):
+            # Unknown categories encode to all zeros (handle_unknown='ignore')
+            position = offsets.get(record[column])
+            if position is not None:
+                row[position] = 1.0
+        return out
+
+    def predict_one(self, record):
+        """Predict the price for a single input record (column -> value)"""
+        return self.regressor.predict(self.encode(record, self._buffer()))[0]
@@ -0,0 +1,90 @@
+"""
+Bounded worker pool for CPU-bound model inference.
+
+Model predictions run in a ThreadPoolExecutor instead of on the asyncio event
+loop, so a burst of prediction traffic cannot stall the other endpoints served
+by the same process (auth, marketplace, ...). The forest's tree traversal
+releases the GIL, so threads give real parallelism here. The number of
+requests waiting for a worker is bounded: once the queue is full, new work is
+rejected immediately with PoolFullError so callers can answer 503 instead of
+piling up latency.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.latency import latency_summary
+
+# Number of recent queue wait times kept for the percentile metrics
+WAIT_SAMPLES = 1024
+
+
+class PoolFullError(Exception):
+    """Raised when the inference queue is full"""
+
+
+class InferencePool:
+    """Thread pool with a bounded queue and queue depth / wait time metrics"""
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._waits_ms = deque(maxlen=WAIT_SAMPLES)
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on a worker thread, raising PoolFullError if the queue is full"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PoolFullError(f"Inference queue is full ({self.max_queue} waiting)")
+            self._in_flight += 1
+            self.submitted += 1
+        enqueued = time.perf_counter()
+
+        def task():
+            with self._lock:
+                self._running += 1
+                self._waits_ms.append((time.perf_counter() - enqueued) * 1000)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        # The slot is released when the work finishes or is cancelled before starting
+        future = self._executor.submit(task)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_ms": latency_summary(self._waits_ms)
+            }
@@ -0,0 +1,141 @@
+"""
+Dynamic micro-batching for single-row price predictions.
+
+Concurrent /predict requests are collected for up to a short window (or
+until a row limit is reached) and scored with one vectorized model call,
+trading a little latency per request for much higher throughput under load.
+Batch sizes and queueing delays are recorded so the window can be tuned.
+The number of rows waiting for a batch is bounded like the inference pool's
+queue: when it is full, submit() raises PoolFullError.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from price_prediction.api.inference_pool import PoolFullError
+from utils.latency import latency_summary
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+# Number of recent queueing delays kept for the percentile metrics
+DELAY_SAMPLES = 1024
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into batched model calls"""
+
+    def __init__(self, max_wait_ms, max_batch_size, max_queue, run_batch):
+        """
+        run_batch(loaded, records) is an async callable returning one predicted
+        price per record; it is called once per collected batch. At most
+        max_queue rows wait to join a batch.
+        """
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self.max_queue = max_queue
+        self.run_batch = run_batch
+        self._queue = None
+        self._collector = None
+        self._dispatches = set()
+
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self.batch_size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS + (float('inf'),)}
+        self._delays_ms = deque(maxlen=DELAY_SAMPLES)
+
+    @property
+    def enabled(self):
+        return self.max_wait_ms > 0 and self.max_batch_size > 1
+
+    def start(self):
+        """Start the collector task on the running event loop"""
+        if self.enabled and self._collector is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._collector = asyncio.create_task(self._collect())
+
+    def stop(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector = None
+
+    async def submit(self, loaded, record):
+        """Queue one record for the next batch and wait for its predicted price"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((loaded, record, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise PoolFullError(f"Micro-batching queue is full ({self.max_queue} waiting)")
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Score the batch concurrently so the next one can start collecting
+            dispatch = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(dispatch)
+            dispatch.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch):
+        dispatched = time.perf_counter()
+        self._record(batch, dispatched)
+
+        # A model swap can land inside a window; score each model's rows separately
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+        for items in groups.values():
+            try:
+                predicted_prices = await self.run_batch(items[0][0], [item[1] for item in items])
+            except Exception as e:
+                for _, _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future, _), predicted_price in zip(items, predicted_prices):
+                if not future.done():
+                    future.set_result(predicted_price)
+
+    def _record(self, batch, dispatched):
+        self.batches += 1
+        self.rows += len(batch)
+        for bucket in self.batch_size_counts:
+            if len(batch) <= bucket:
+                self.batch_size_counts[bucket] += 1
+                break
+        for _, _, _, enqueued in batch:
+            self._delays_ms.append((dispatched - enqueued) * 1000)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": {
+                (f"<={bucket}" if bucket != float('inf') else f">{BATCH_SIZE_BUCKETS[-1]}"): count
+                for bucket, count in self.batch_size_counts.items()
+            },
+            "queue_delay_ms": latency_summary(self._delays_ms)
+        }
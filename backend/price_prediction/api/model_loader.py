@@ -0,0 +1,249 @@
+"""
+Loading, validation and hot swapping of the crop price model.
+
+A LoadedModel bundles a model artifact with everything derived from it (the
+feature columns, the fast single-row predictor and the artifact version), so
+that swapping models is a single reference assignment. ModelRegistry keeps the
+serving model and the previous one for rollback, and loads and validates new
+artifacts against a smoke batch before they are swapped in.
+"""
+
+import math
+import os
+import threading
+import time
+
+import joblib
+import pandas as pd
+
+from price_prediction.api.fast_inference import FastRowPredictor
+from price_prediction.api.prediction_cache import artifact_version
+from price_prediction.models.flat_forest import FlatForest
+from price_prediction.models.price_table import PriceTable
+
+# Number of generated rows every new model must predict before it is served
+SMOKE_ROWS = 32
+
+
+class LoadedModel:
+    """A model artifact together with its feature columns and fast path"""
+
+    def __init__(self, engine, model, feature_columns, version, load_seconds):
+        self.engine = engine
+        self.model = model
+        self.feature_columns = feature_columns
+        self.version = version
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.price_table = None
+
+        # Build the DataFrame-free single-row path; fall back to the pipeline if unsupported
+        self.fast_predictor = None
+        if isinstance(model, FlatForest):
+            self.fast_predictor = model
+        else:
+            try:
+                self.fast_predictor = FastRowPredictor(model, feature_columns)
+            except Exception as e:
+                print(f"Fast single-row inference disabled: {e}")
+
+    def predict_one(self, record):
+        """Predict the price for one input record"""
+        if self.fast_predictor is not None:
+            return float(self.fast_predictor.predict_one(record))
+        # Create a DataFrame with a single row for prediction
+        input_data = pd.DataFrame({column: [value] for column, value in record.items()})
+        return float(self.model.predict(input_data)[0])
+
+    def predict_many(self, records):
+        """Predict prices for many input records with one vectorized model call"""
+        input_data = pd.DataFrame({
+            column: [record[column] for record in records] for column in records[0]
+        })
+        return [float(predicted_price) for predicted_price in self.model.predict(input_data)]
+
+    def input_space(self):
+        """Return ([(column, mean, scale)], [(column, categories)]) the model was trained on"""
+        if isinstance(self.model, FlatForest):
+            means, scales = self.model.mean, self.model.scale
+            categories = self.model.metadata['categories']
+        else:
+            preprocessor = self.model.named_steps['preprocessor']
+            scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+            onehot = preprocessor.named_transformers_['cat'].named_steps['onehot']
+            means, scales, categories = scaler.mean_, scaler.scale_, onehot.categories_
+        numeric = [(column, float(means[i]), float(scales[i]))
+                   for i, column in enumerate(self.feature_columns['numeric_features'])]
+        categorical = [(column, list(values))
+                       for column, values in zip(self.feature_columns['categorical_features'], categories)]
+        return numeric, categorical
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "engine": self.engine,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 4),
+            "price_table": self.price_table is not None
+        }
+
+
+def smoke_records(loaded, n=SMOKE_ROWS):
+    """Deterministic input records spread over the model's own input space"""
+    numeric, categorical = loaded.input_space()
+    records = []
+    for i in range(n):
+        record = {column: mean + ((i % 5) - 2) * scale for column, mean, scale in numeric}
+        record.update({column: categories[i % len(categories)] for column, categories in categorical})
+        records.append(record)
+    return records
+
+
+def validate_model(loaded):
+    """Run the smoke batch through a loaded model, raising ValueError if it misbehaves"""
+    records = smoke_records(loaded)
+    predicted_prices = loaded.predict_many(records)
+    if len(predicted_prices) != len(records):
+        raise ValueError(f"Model returned {len(predicted_prices)} predictions for {len(records)} rows")
+    if not all(math.isfinite(predicted_price) for predicted_price in predicted_prices):
+        raise ValueError("Model returned non-finite predictions for the smoke batch")
+    # The single-row path must agree with the batch path
+    for record, predicted_price in zip(records[:4], predicted_prices):
+        if loaded.predict_one(record) != predicted_price:
+            raise ValueError("Single-row and batch predictions disagree for the smoke batch")
+
+
+class ModelRegistry:
+    """Holds the serving model and the previous one, and swaps them atomically"""
+
+    def __init__(self, engine, model_path, feature_columns_path, flat_model_path, price_table_path=None, on_swap=None):
+        self.engine = engine
+        self.model_path = model_path
+        self.feature_columns_path = feature_columns_path
+        self.flat_model_path = flat_model_path
+        self.price_table_path = price_table_path
+        self.on_swap = on_swap
+
+        self.current = None
+        self.previous = None
+        self._reload_lock = threading.Lock()
+
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.rollbacks = 0
+        self.last_reload = None
+        self.last_error = None
+
+    def artifact_paths(self):
+        """Files that make up the artifact for this engine, plus the price table"""
+        if self.engine == "flat":
+            paths = [os.path.join(self.flat_model_path, name) for name in sorted(os.listdir(self.flat_model_path))]
+        else:
+            paths = [self.model_path, self.feature_columns_path]
+        # A rebuilt price table is picked up like a new model
+        if self.price_table_path and os.path.exists(self.price_table_path):
+            paths.append(self.price_table_path)
+        return paths
+
+    def artifact_signature(self):
+        """Cheap change detector for the artifact files (inode, size and mtime)"""
+        try:
+            return tuple(
+                (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                for path, stat in ((path, os.stat(path)) for path in self.artifact_paths())
+            )
+        except OSError:
+            return None
+
+    def load(self):
+        """Load and validate the artifact from disk without serving it"""
+        start = time.perf_counter()
+        if self.engine == "flat":
+            model = FlatForest.load(self.flat_model_path, mmap_mode='r')
+            feature_columns = {
+                'numeric_features': model.numeric_features,
+                'categorical_features': model.categorical_features
+            }
+            version = artifact_version(self.flat_model_path)
+        else:
+            model = joblib.load(self.model_path)
+            feature_columns = joblib.load(self.feature_columns_path)
+            version = artifact_version(self.model_path)
+        loaded = LoadedModel(self.engine, model, feature_columns, version, time.perf_counter() - start)
+        validate_model(loaded)
+        loaded.price_table = self.load_price_table(version)
+        return loaded
+
+    def load_price_table(self, version):
+        """Load the price table if there is one built from this model version"""
+        if not self.price_table_path or not os.path.exists(self.price_table_path):
+            return None
+        try:
+            table = PriceTable.load(self.price_table_path)
+        except Exception as e:
+            print(f"Price table disabled: {e}")
+            return None
+        if version not in table.model_versions:
+            print("Price table disabled: it was built from a different model version")
+            return None
+        return table
+
+    def _swap(self, loaded):
+        """Make loaded the serving model and return the swap latency in ms"""
+        start = time.perf_counter()
+        self.previous, self.current = self.current, loaded
+        if self.on_swap is not None:
+            self.on_swap(loaded)
+        return (time.perf_counter() - start) * 1000
+
+    def reload(self):
+        """
+        Load, validate and swap in the artifact currently on disk.
+
+        Runs off the request path (call it from a worker thread); requests keep
+        using the current model until the single reference swap. Raises if the
+        new artifact fails to load or validate, leaving the current model serving.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            try:
+                loaded = self.load()
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            validate_seconds = time.perf_counter() - start - loaded.load_seconds
+            previous_version = self.current.version if self.current is not None else None
+            swap_ms = self._swap(loaded)
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload = {
+                "version": loaded.version,
+                "previous_version": previous_version,
+                "load_seconds": round(loaded.load_seconds, 4),
+                "validate_seconds": round(validate_seconds, 4),
+                "swap_ms": round(swap_ms, 4),
+                "at": time.time()
+            }
+            return self.last_reload
+
+    def rollback(self):
+        """Swap the previous model back in; raises LookupError if there is none"""
+        with self._reload_lock:
+            if self.previous is None:
+                raise LookupError("No previous model to roll back to")
+            swap_ms = self._swap(self.previous)
+            self.rollbacks += 1
+            return {"version": self.current.version, "swap_ms": round(swap_ms, 4)}
+
+    def stats(self):
+        current, previous = self.current, self.previous
+        return {
+            "current": current.describe() if current is not None else None,
+            "previous": previous.describe() if previous is not None else None,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "rollbacks": self.rollbacks,
+            "last_reload": self.last_reload,
+            "last_error": self.last_error
+        }
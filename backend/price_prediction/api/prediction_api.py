@@ -1,11 +1,17 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-import pandas as pd
-import joblib
+import asyncio
 import os
+import secrets
 import sys
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+from price_prediction.api.inference_pool import InferencePool, PoolFullError
+from price_prediction.api.micro_batcher import MicroBatcher
+from price_prediction.api.model_loader import LoadedModel, ModelRegistry
+from price_prediction.api.prediction_cache import PredictionCache
+from utils.request_rows import read_rows, validate_rows
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -13,11 +19,53 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Set paths
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
-model_dir = os.path.join(parent_dir, 'models')
+model_dir = os.environ.get("PREDICTION_MODEL_DIR", os.path.join(parent_dir, 'models'))
 
 # Load model and feature columns
 model_path = os.path.join(model_dir, 'crop_price_model.joblib')
 feature_columns_path = os.path.join(model_dir, 'feature_columns.joblib')
+flat_model_path = os.path.join(model_dir, 'crop_price_model_flat')
+price_table_path = os.path.join(model_dir, 'crop_price_table.npz')
+
+# Inference engine: "pipeline" serves the joblib sklearn Pipeline, "flat" serves the
+# NumPy-only export written by price_prediction/models/export_model.py. The flat model
+# is memory-mapped, so all worker processes share one copy of the forest.
+PREDICTION_ENGINE = os.environ.get("PREDICTION_ENGINE", "pipeline")
+
+# Prediction cache: number of entries kept (0 disables the cache) and their lifetime in seconds
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))
+
+# Seconds between checks of the model artifact for changes (0 disables the watcher).
+# A changed artifact is hot-reloaded once it has been stable for one interval.
+PREDICTION_RELOAD_INTERVAL = float(os.environ.get("PREDICTION_RELOAD_INTERVAL", "0"))
+
+# When set, the /admin endpoints require this value in the X-Admin-Token header
+PREDICTION_ADMIN_TOKEN = os.environ.get("PREDICTION_ADMIN_TOKEN")
+
+# Inference runs on a pool of worker threads off the event loop. When more than
+# PREDICTION_POOL_QUEUE requests are already waiting, new ones get a 503 with
+# Retry-After instead of queueing without bound.
+PREDICTION_POOL_WORKERS = int(os.environ.get("PREDICTION_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PREDICTION_POOL_QUEUE = int(os.environ.get("PREDICTION_POOL_QUEUE", "64"))
+PREDICTION_RETRY_AFTER = int(os.environ.get("PREDICTION_RETRY_AFTER", "1"))
+
+# Opt-in micro-batching of concurrent /predict requests: cache misses arriving within
+# PREDICTION_MICROBATCH_WINDOW_MS (0 disables batching) are scored together, up to
+# PREDICTION_MICROBATCH_MAX_ROWS rows per model call; at most PREDICTION_POOL_QUEUE
+# rows wait for a batch, further ones get the same 503 as a full pool
+PREDICTION_MICROBATCH_WINDOW_MS = float(os.environ.get("PREDICTION_MICROBATCH_WINDOW_MS", "0"))
+PREDICTION_MICROBATCH_MAX_ROWS = int(os.environ.get("PREDICTION_MICROBATCH_MAX_ROWS", "64"))
+
+# Default answer source for /predict and /predict/batch when no ?mode= is given:
+# "model" runs the live model, "table" interpolates in the precomputed price table
+# written by price_prediction/models/build_price_table.py and falls back to the
+# live model for inputs outside the table's grid
+PREDICTION_MODE = os.environ.get("PREDICTION_MODE", "model")
+
+# Maximum number of rows accepted by /predict/batch in a single call.
+# Larger jobs should be split into several requests.
+MAX_BATCH_SIZE = int(os.environ.get("PREDICTION_MAX_BATCH_SIZE", "10000"))
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -35,6 +83,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Predicted prices keyed on model version + normalized input
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+
+# Serving model and the previous one kept for rollback; cached predictions
+# belong to the previous model, so the cache is dropped on every swap
+model_registry = ModelRegistry(
+    PREDICTION_ENGINE, model_path, feature_columns_path, flat_model_path, price_table_path,
+    on_swap=lambda loaded: prediction_cache.clear()
+)
+artifact_watcher = None
+
+# Worker threads that run model inference
+inference_pool = InferencePool(PREDICTION_POOL_WORKERS, PREDICTION_POOL_QUEUE)
+
+# Coalesces concurrent single-row predictions into one model call on the pool
+micro_batcher = MicroBatcher(
+    PREDICTION_MICROBATCH_WINDOW_MS, PREDICTION_MICROBATCH_MAX_ROWS, PREDICTION_POOL_QUEUE,
+    lambda loaded, records: inference_pool.run(loaded.predict_many, records)
+)
+
 # Define the input model for prediction
 class CropPriceInput(BaseModel):
     crop_name: str = Field(..., description="Name of the crop (e.g., Rice, Wheat, Potato)")
@@ -68,89 +136,274 @@ class PricePredictionResponse(BaseModel):
     confidence: str
     factors: Dict[str, Any]
 
+# Define the batch response models
+class BatchPredictionItem(BaseModel):
+    index: int
+    prediction: Optional[PricePredictionResponse] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    count: int
+    succeeded: int
+    failed: int
+    results: List[BatchPredictionItem]
+
+def input_record(crop_input: CropPriceInput) -> Dict[str, Any]:
+    """Map a CropPriceInput to the model's input columns, filling in defaults"""
+    return {
+        'crop_name': crop_input.crop_name,
+        'quantity': crop_input.quantity,
+        'season': crop_input.season,
+        'region': crop_input.region,
+        'rain_fall': crop_input.rain_fall if crop_input.rain_fall is not None else 0,
+        'temperature': crop_input.temperature if crop_input.temperature is not None else 0,
+        'soil_quality': crop_input.soil_quality if crop_input.soil_quality is not None else 'Medium'
+    }
+
+def prediction_payload(crop_input: CropPriceInput, predicted_price: float) -> Dict[str, Any]:
+    """Build the PricePredictionResponse fields for a predicted price"""
+    predicted_price = float(predicted_price)
+    
+    # Calculate price per kg
+    price_per_kg = predicted_price / crop_input.quantity
+    
+    # Generate response with confidence interval (10% range)
+    min_price = predicted_price * 0.9
+    max_price = predicted_price * 1.1
+    
+    # Calculate median price (as an estimate based on min and max)
+    median_price = (min_price + max_price) / 2
+    
+    # Determine confidence based on input completeness
+    missing_values = sum(1 for value in [crop_input.rain_fall, crop_input.temperature, crop_input.soil_quality] if value is None)
+    if missing_values == 0:
+        confidence = "High"
+    elif missing_values == 1:
+        confidence = "Medium"
+    else:
+        confidence = "Low"
+    
+    return {
+        "predicted_price": round(predicted_price, 2),
+        "price_per_kg": round(price_per_kg, 2),
+        "min_price": round(min_price, 2),
+        "max_price": round(max_price, 2),
+        "median_price": round(median_price, 2),
+        "confidence": confidence,
+        "factors": {
+            "crop_type": crop_input.crop_name,
+            "quantity": crop_input.quantity,
+            "season": crop_input.season,
+            "region": crop_input.region,
+            "weather_conditions": {
+                "rain_fall": crop_input.rain_fall,
+                "temperature": crop_input.temperature
+            },
+            "soil_quality": crop_input.soil_quality
+        }
+    }
+
+async def predict_one(loaded: LoadedModel, record: Dict[str, Any], mode: str = "model") -> float:
+    """Predict the price for one input record, using the price table or the prediction cache"""
+    if mode == "table" and loaded.price_table is not None:
+        predicted_price = loaded.price_table.lookup(record)
+        if predicted_price is not None:
+            return predicted_price
+    cache_key = PredictionCache.key(loaded.version, record)
+    predicted_price = prediction_cache.get(cache_key)
+    if predicted_price is None:
+        if micro_batcher.enabled:
+            predicted_price = await micro_batcher.submit(loaded, record)
+        else:
+            predicted_price = await inference_pool.run(loaded.predict_one, record)
+        prediction_cache.put(cache_key, predicted_price)
+    return predicted_price
+
+async def predict_many(loaded: LoadedModel, records: List[Dict[str, Any]], mode: str = "model") -> List[float]:
+    """Predict prices for many input records with one model call for the table and cache misses"""
+    if mode == "table" and loaded.price_table is not None:
+        predicted_prices = [loaded.price_table.lookup(record) for record in records]
+    else:
+        predicted_prices = [None] * len(records)
+    cache_keys = [PredictionCache.key(loaded.version, record) for record in records]
+    for i, predicted_price in enumerate(predicted_prices):
+        if predicted_price is None:
+            predicted_prices[i] = prediction_cache.get(cache_keys[i])
+    missing = [i for i, predicted_price in enumerate(predicted_prices) if predicted_price is None]
+    if missing:
+        missing_prices = await inference_pool.run(loaded.predict_many, [records[i] for i in missing])
+        for i, predicted_price in zip(missing, missing_prices):
+            predicted_prices[i] = predicted_price
+            prediction_cache.put(cache_keys[i], predicted_price)
+    return predicted_prices
+
+def get_loaded_model() -> LoadedModel:
+    """Snapshot of the serving model, so a request never mixes two models"""
+    loaded = model_registry.current
+    if loaded is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return loaded
+
+def pool_full_error(error: PoolFullError) -> HTTPException:
+    """503 telling the client to back off while the inference queue is full"""
+    return HTTPException(
+        status_code=503,
+        detail=f"Prediction service busy: {str(error)}",
+        headers={"Retry-After": str(PREDICTION_RETRY_AFTER)}
+    )
+
+def check_admin_token(token: Optional[str]):
+    if PREDICTION_ADMIN_TOKEN and not (token and secrets.compare_digest(token, PREDICTION_ADMIN_TOKEN)):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+async def watch_model_artifact():
+    """Hot-reload the model when its artifact changes on disk"""
+    loaded_signature = model_registry.artifact_signature()
+    pending_signature = None
+    while True:
+        await asyncio.sleep(PREDICTION_RELOAD_INTERVAL)
+        signature = model_registry.artifact_signature()
+        if signature is None or signature == loaded_signature:
+            pending_signature = None
+            continue
+        # Wait until the files stop changing so a half-finished training run is not loaded
+        if signature != pending_signature:
+            pending_signature = signature
+            continue
+        loaded_signature = signature
+        pending_signature = None
+        try:
+            report = await asyncio.to_thread(model_registry.reload)
+            print(f"Model hot-reloaded: {report}")
+        except Exception as e:
+            print(f"Model reload failed, keeping version {model_registry.current and model_registry.current.version}: {e}")
+
 # Handle startup events - load model when app starts
 @app.on_event("startup")
 async def startup_event():
-    global model, feature_columns
+    global artifact_watcher
     try:
-        model = joblib.load(model_path)
-        feature_columns = joblib.load(feature_columns_path)
-        print("Model and feature columns loaded successfully")
+        model_registry.reload()
+        print(f"Model and feature columns loaded successfully ({PREDICTION_ENGINE} engine, version {model_registry.current.version})")
     except Exception as e:
         print(f"Error loading model: {e}")
-        model = None
-        feature_columns = None
+    
+    if PREDICTION_RELOAD_INTERVAL > 0:
+        artifact_watcher = asyncio.create_task(watch_model_artifact())
+    micro_batcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if artifact_watcher is not None:
+        artifact_watcher.cancel()
+    micro_batcher.stop()
+    inference_pool.shutdown()
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    if model is not None:
-        return {"status": "healthy", "model_loaded": True}
-    return {"status": "unhealthy", "model_loaded": False}
+    loaded = model_registry.current
+    if loaded is not None:
+        return {"status": "healthy", "model_loaded": True, "engine": PREDICTION_ENGINE, "model_version": loaded.version}
+    return {"status": "unhealthy", "model_loaded": False, "engine": PREDICTION_ENGINE, "model_version": None}
+
+# Statistics endpoint
+@app.get("/stats")
+async def get_stats():
+    loaded = model_registry.current
+    price_table = loaded.price_table if loaded is not None else None
+    return {
+        "engine": PREDICTION_ENGINE,
+        "mode": PREDICTION_MODE,
+        "model": model_registry.stats(),
+        "price_table": price_table.stats() if price_table is not None else None,
+        "cache": prediction_cache.stats(),
+        "pool": inference_pool.stats(),
+        "microbatch": micro_batcher.stats()
+    }
+
+# Admin endpoint to hot-reload the model artifact from disk
+@app.post("/admin/reload")
+async def reload_model(x_admin_token: Optional[str] = Header(None)):
+    """Load, validate and swap in the model currently on disk without a restart"""
+    check_admin_token(x_admin_token)
+    try:
+        return await asyncio.to_thread(model_registry.reload)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Model reload failed: {str(e)}")
+
+# Admin endpoint to go back to the previously served model
+@app.post("/admin/rollback")
+async def rollback_model(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        return model_registry.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 # Prediction endpoint
 @app.post("/predict", response_model=PricePredictionResponse)
-async def predict_price(crop_input: CropPriceInput):
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+async def predict_price(
+    crop_input: CropPriceInput,
+    mode: str = Query(PREDICTION_MODE, pattern="^(model|table)$", description="Answer from the live model or the price table")
+):
+    loaded = get_loaded_model()
     
     try:
-        # Create a DataFrame with a single row for prediction
-        input_data = pd.DataFrame({
-            'crop_name': [crop_input.crop_name],
-            'quantity': [crop_input.quantity],
-            'season': [crop_input.season],
-            'region': [crop_input.region],
-            'rain_fall': [crop_input.rain_fall if crop_input.rain_fall is not None else 0],
-            'temperature': [crop_input.temperature if crop_input.temperature is not None else 0],
-            'soil_quality': [crop_input.soil_quality if crop_input.soil_quality is not None else 'Medium']
-        })
-        
         # Make prediction
-        predicted_price = model.predict(input_data)[0]
+        predicted_price = await predict_one(loaded, input_record(crop_input), mode)
         
-        # Calculate price per kg
-        price_per_kg = predicted_price / crop_input.quantity
-        
-        # Generate response with confidence interval (10% range)
-        min_price = predicted_price * 0.9
-        max_price = predicted_price * 1.1
-        
-        # Calculate median price (as an estimate based on min and max)
-        median_price = (min_price + max_price) / 2
-        
-        # Determine confidence based on input completeness
-        missing_values = sum(1 for value in [crop_input.rain_fall, crop_input.temperature, crop_input.soil_quality] if value is None)
-        if missing_values == 0:
-            confidence = "High"
-        elif missing_values == 1:
-            confidence = "Medium"
-        else:
-            confidence = "Low"
-        
-        # Return prediction results
-        return PricePredictionResponse(
-            predicted_price=round(predicted_price, 2),
-            price_per_kg=round(price_per_kg, 2),
-            min_price=round(min_price, 2),
-            max_price=round(max_price, 2),
-            median_price=round(median_price, 2),
-            confidence=confidence,
-            factors={
-                "crop_type": crop_input.crop_name,
-                "quantity": crop_input.quantity,
-                "season": crop_input.season,
-                "region": crop_input.region,
-                "weather_conditions": {
-                    "rain_fall": crop_input.rain_fall,
-                    "temperature": crop_input.temperature
-                },
-                "soil_quality": crop_input.soil_quality
-            }
-        )
+        return PricePredictionResponse(**prediction_payload(crop_input, predicted_price))
+    except PoolFullError as e:
+        raise pool_full_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+# Batch prediction endpoint
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_price_batch(
+    request: Request,
+    mode: str = Query(PREDICTION_MODE, pattern="^(model|table)$", description="Answer from the live model or the price table")
+):
+    """
+    Predict prices for many rows in one call.
+
+    The body is either a JSON array of CropPriceInput objects or, when sent
+    with an NDJSON content type (application/x-ndjson), one CropPriceInput
+    object per line. At most MAX_BATCH_SIZE rows are accepted per call.
+    Results are returned in input order; rows that fail validation carry an
+    error message instead of a prediction and do not affect the other rows.
+    With mode=table, rows inside the price table's grid are interpolated from
+    the table and only the rest are sent to the live model.
+    """
+    loaded = get_loaded_model()
+    
+    raw_rows = await read_rows(request, MAX_BATCH_SIZE)
+    
+    # Validate every row, remembering the position of the valid ones
+    results, valid = validate_rows(raw_rows, CropPriceInput)
+    
+    if valid:
+        try:
+            predicted_prices = await predict_many(loaded, [input_record(crop_input) for _, crop_input in valid], mode)
+        except PoolFullError as e:
+            raise pool_full_error(e)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+        
+        for (index, crop_input), predicted_price in zip(valid, predicted_prices):
+            results[index] = {
+                "index": index,
+                "prediction": prediction_payload(crop_input, predicted_price)
+            }
+    
+    return {
+        "count": len(results),
+        "succeeded": len(valid),
+        "failed": len(results) - len(valid),
+        "results": results
+    }
+
 # Run with: uvicorn price_prediction.api.prediction_api:app --reload
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,102 @@
+"""
+Bounded LRU/TTL cache for price predictions.
+
+Keys are built from the model version and the normalized model input (the
+record after defaults are filled in), so requests that only differ in how
+optional fields were left out share an entry, and entries computed by a
+previous model can never be returned once the model version changes.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def artifact_version(path):
+    """Short content hash of a model artifact file or directory"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    else:
+        paths = [path]
+    for file_path in paths:
+        digest.update(os.path.basename(file_path).encode())
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with a per-entry time-to-live"""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(model_version, record):
+        """Cache key for a normalized input record under a model version"""
+        return (model_version,) + tuple(record.values())
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
@@ -0,0 +1,201 @@
+"""
+Build the precomputed price lookup table for the trained crop price model.
+
+The model is evaluated over every combination of the categories it was trained
+on, at evenly spaced anchor points for each numeric input: the training mean
++/- two standard deviations (from the fitted scaler), clipped to non-negative
+values inside the range of the forest's split thresholds, so no cell is built
+from inputs the model never saw. The result is
+saved as crop_price_table.npz together with the accuracy the interpolated
+table gives up compared to the live model on random in-grid inputs.
+
+Usage: python price_prediction/models/build_price_table.py [--anchors 11]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from price_prediction.api.prediction_cache import artifact_version
+from price_prediction.models.price_table import PriceTable
+
+# Set paths
+model_dir = os.path.dirname(os.path.abspath(__file__))
+model_path = os.path.join(model_dir, 'crop_price_model.joblib')
+feature_columns_path = os.path.join(model_dir, 'feature_columns.joblib')
+flat_model_path = os.path.join(model_dir, 'crop_price_model_flat')
+price_table_path = os.path.join(model_dir, 'crop_price_table.npz')
+
+# Refuse to build tables with more cells than this
+MAX_TABLE_CELLS = 20_000_000
+
+# Rows per model.predict call while evaluating the grid
+PREDICT_CHUNK_ROWS = 200_000
+
+# Random in-grid inputs used to measure the accuracy of the table
+ACCURACY_ROWS = 2000
+
+
+def anchor_count(value):
+    """argparse type for --anchors: interpolation needs two anchors per feature"""
+    n_anchors = int(value)
+    if n_anchors < 2:
+        raise argparse.ArgumentTypeError("must be at least 2")
+    return n_anchors
+
+
+def split_range(regressor, feature_index):
+    """
+    (lowest, highest) split threshold on an encoded feature over all trees, or None.
+
+    Thresholds lie between values seen in training, and the forest's prediction
+    does not change beyond the outermost ones, so this is the part of the
+    training range the model actually uses.
+    """
+    thresholds = [estimator.tree_.threshold[estimator.tree_.feature == feature_index]
+                  for estimator in regressor.estimators_]
+    thresholds = np.concatenate(thresholds) if thresholds else np.empty(0)
+    return (thresholds.min(), thresholds.max()) if len(thresholds) else None
+
+
+def grid_axes(model, feature_columns, n_anchors):
+    """Return (anchors per numeric feature, categories per categorical feature)"""
+    preprocessor = model.named_steps['preprocessor']
+    regressor = model.named_steps['regressor']
+    scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+    onehot = preprocessor.named_transformers_['cat'].named_steps['onehot']
+    anchors = []
+    for i in range(len(feature_columns['numeric_features'])):
+        mean, scale = scaler.mean_[i], scaler.scale_[i]
+        # mean +/- 2 std, kept to non-negative inputs inside the training range
+        low, high = max(mean - 2 * scale, 0.0), mean + 2 * scale
+        trained = split_range(regressor, i)
+        if trained is not None:
+            trained_low, trained_high = trained[0] * scale + mean, trained[1] * scale + mean
+            if max(low, trained_low) < min(high, trained_high):
+                low, high = max(low, trained_low), min(high, trained_high)
+        anchors.append(np.linspace(low, high, n_anchors))
+    return anchors, [categories.tolist() for categories in onehot.categories_]
+
+
+def evaluate_grid(model, feature_columns, anchors, categories):
+    """Predict every (category combination, anchor cell) of the grid"""
+    numeric_features = feature_columns['numeric_features']
+    categorical_features = feature_columns['categorical_features']
+    anchor_shape = tuple(len(a) for a in anchors)
+    cells = int(np.prod(anchor_shape, dtype=np.int64))
+    sizes = [len(c) for c in categories]
+    combinations = int(np.prod(sizes, dtype=np.int64))
+
+    mesh = [axis.ravel() for axis in np.meshgrid(*anchors, indexing='ij')] if anchors else []
+    category_arrays = [np.asarray(c, dtype=object) for c in categories]
+
+    values = np.empty((combinations, cells), dtype=np.float64)
+    block = max(1, PREDICT_CHUNK_ROWS // cells)
+    for start in range(0, combinations, block):
+        stop = min(start + block, combinations)
+        digits = np.unravel_index(np.arange(start, stop), sizes)
+        input_data = {}
+        for column, axis in zip(numeric_features, mesh):
+            input_data[column] = np.tile(axis, stop - start)
+        for column, values_i, digit in zip(categorical_features, category_arrays, digits):
+            input_data[column] = np.repeat(values_i[digit], cells)
+        values[start:stop] = model.predict(pd.DataFrame(input_data)).reshape(stop - start, cells)
+    return values.reshape((combinations,) + anchor_shape)
+
+
+def measure_accuracy(model, table, anchors, categories, n=ACCURACY_ROWS, seed=0):
+    """Compare table lookups with live model predictions on random in-grid inputs"""
+    rng = np.random.default_rng(seed)
+    input_data = {}
+    for column, axis in zip(table.numeric_features, anchors):
+        input_data[column] = rng.uniform(axis[0], axis[-1], n)
+    for column, values in zip(table.categorical_features, categories):
+        input_data[column] = rng.choice(np.asarray(values, dtype=object), n)
+    input_data = pd.DataFrame(input_data)
+
+    expected = model.predict(input_data)
+    actual = np.array([table.lookup(record) for record in input_data.to_dict('records')])
+    errors = np.abs(actual - expected)
+    percent = errors / np.maximum(np.abs(expected), 1e-9) * 100
+    table.lookups = table.hits = 0
+    return {
+        "rows": n,
+        "mae": round(float(errors.mean()), 4),
+        "max_abs_error": round(float(errors.max()), 4),
+        "mean_pct_error": round(float(percent.mean()), 4),
+        "p95_pct_error": round(float(np.percentile(percent, 95)), 4)
+    }
+
+
+def write_price_table(path, **arrays):
+    """Save the arrays to path, replacing any previous table atomically"""
+    # The API's hot reloader watches the table; it must never see a partial file
+    path = os.path.abspath(path)
+    staging_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(staging_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(staging_path, path)
+    except BaseException:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        raise
+
+
+def build_price_table(model, feature_columns, path=price_table_path, n_anchors=11, model_versions=()):
+    """Evaluate the model over the full grid and save the table to path"""
+    if n_anchors < 2:
+        raise ValueError("n_anchors must be at least 2")
+    anchors, categories = grid_axes(model, feature_columns, n_anchors)
+    cells = int(np.prod([len(c) for c in categories], dtype=np.int64)) * n_anchors ** len(anchors)
+    if cells > MAX_TABLE_CELLS:
+        raise ValueError(f"Grid has {cells} cells (limit {MAX_TABLE_CELLS}); use fewer anchors")
+
+    start = time.perf_counter()
+    values = evaluate_grid(model, feature_columns, anchors, categories)
+    build_seconds = time.perf_counter() - start
+
+    metadata = {
+        'numeric_features': list(feature_columns['numeric_features']),
+        'categorical_features': list(feature_columns['categorical_features']),
+        'categories': categories,
+        'model_versions': list(model_versions),
+        'build_seconds': round(build_seconds, 2)
+    }
+    table = PriceTable(values, anchors, metadata)
+    metadata['accuracy'] = measure_accuracy(model, table, anchors, categories)
+
+    arrays = {f'anchors_{i}': axis for i, axis in enumerate(anchors)}
+    write_price_table(path, values=values, metadata=np.array(json.dumps(metadata)), **arrays)
+    print(f"Price table saved to {path} ({values.shape[0]} combinations, {values.size} cells, "
+          f"built in {build_seconds:.1f}s)")
+    print(f"Table accuracy vs live model: {metadata['accuracy']}")
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed crop price lookup table")
+    parser.add_argument('--anchors', type=anchor_count, default=11, help="Anchor points per numeric feature (at least 2)")
+    args = parser.parse_args()
+
+    # The table is valid for both the joblib pipeline and its flat export
+    model_versions = [artifact_version(model_path)]
+    if os.path.isdir(flat_model_path):
+        model_versions.append(artifact_version(flat_model_path))
+
+    build_price_table(joblib.load(model_path), joblib.load(feature_columns_path),
+                      n_anchors=args.anchors, model_versions=model_versions)
+
+
+if __name__ == "__main__":
+    main()
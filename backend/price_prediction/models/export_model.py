@@ -0,0 +1,160 @@
+"""
+Export the trained crop price Pipeline into a flat, array-backed model.
+
+The fitted StandardScaler statistics, OneHotEncoder category maps and the node
+arrays (feature, threshold, children, value) of every tree are concatenated
+into contiguous NumPy arrays and saved next to the joblib artifact, so that
+flat_forest.FlatForest can serve predictions without scikit-learn. Every
+export is checked against Pipeline.predict before it is written.
+
+The export is a directory of uncompressed .npy files that workers open with
+mmap_mode='r'. A new export is written to a temporary directory and swapped in
+with renames, so files that running workers have mapped are never modified.
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from price_prediction.models.flat_forest import FlatForest, ARRAY_NAMES, METADATA_FILE
+
+# Set paths
+model_dir = os.path.dirname(os.path.abspath(__file__))
+model_path = os.path.join(model_dir, 'crop_price_model.joblib')
+feature_columns_path = os.path.join(model_dir, 'feature_columns.joblib')
+flat_model_path = os.path.join(model_dir, 'crop_price_model_flat')
+
+# Number of generated rows used to check the export against the Pipeline
+PARITY_ROWS = 1000
+
+
+def sample_records(model, feature_columns, n, seed=0):
+    """
+    Generate n input records that match the model's own training schema.
+
+    Numeric values are drawn around the fitted scaler mean and categorical
+    values from the one-hot encoder's known categories.
+    """
+    rng = np.random.default_rng(seed)
+    preprocessor = model.named_steps['preprocessor']
+    scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+    onehot = preprocessor.named_transformers_['cat'].named_steps['onehot']
+
+    columns = {}
+    for i, column in enumerate(feature_columns['numeric_features']):
+        columns[column] = rng.normal(scaler.mean_[i], scaler.scale_[i], n).round(2).tolist()
+    for categories, column in zip(onehot.categories_, feature_columns['categorical_features']):
+        columns[column] = rng.choice(categories, n).tolist()
+
+    return [{column: values[i] for column, values in columns.items()} for i in range(n)]
+
+
+def flatten_model(model, feature_columns):
+    """Flatten a fitted Pipeline into (arrays, metadata) for FlatForest"""
+    numeric_features = list(feature_columns['numeric_features'])
+    categorical_features = list(feature_columns['categorical_features'])
+
+    preprocessor = model.named_steps['preprocessor']
+    regressor = model.named_steps['regressor']
+    scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+    onehot = preprocessor.named_transformers_['cat'].named_steps['onehot']
+
+    if onehot.drop is not None or getattr(onehot, 'infrequent_categories_', None) is not None:
+        raise ValueError("One-hot encoders with dropped or infrequent categories are not supported")
+    if regressor.n_outputs_ != 1:
+        raise ValueError("Only single-output regressors are supported")
+
+    n_numeric = len(numeric_features)
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_numeric)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_numeric)
+
+    # Concatenate the node arrays of all trees, shifting child indices by the tree offset
+    roots, features, thresholds, lefts, rights, values = [], [], [], [], [], []
+    offset = 0
+    for estimator in regressor.estimators_:
+        tree = estimator.tree_
+        roots.append(offset)
+        features.append(tree.feature)
+        thresholds.append(tree.threshold)
+        is_leaf = tree.children_left == -1
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+        values.append(tree.value[:, 0, 0])
+        offset += tree.node_count
+
+    arrays = {
+        'mean': np.ascontiguousarray(mean, dtype=np.float64),
+        'scale': np.ascontiguousarray(scale, dtype=np.float64),
+        'roots': np.asarray(roots, dtype=np.int64),
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'children_left': np.concatenate(lefts).astype(np.int32),
+        'children_right': np.concatenate(rights).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float64),
+    }
+    metadata = {
+        'numeric_features': numeric_features,
+        'categorical_features': categorical_features,
+        'categories': [categories.tolist() for categories in onehot.categories_],
+        'n_trees': len(regressor.estimators_),
+        'n_nodes': offset,
+    }
+    return arrays, metadata
+
+
+def check_parity(model, flat_model, records):
+    """Return the largest absolute difference between the Pipeline and the flat model"""
+    input_data = pd.DataFrame(records)
+    expected = model.predict(input_data)
+    actual = flat_model.predict(input_data)
+    return float(np.max(np.abs(expected - actual))) if len(records) else 0.0
+
+
+def write_flat_model(arrays, metadata, path):
+    """Write the arrays and metadata to the model directory at path, replacing it atomically"""
+    path = os.path.abspath(path)
+    staging_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_path, ignore_errors=True)
+    os.makedirs(staging_path)
+    
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(staging_path, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+    with open(os.path.join(staging_path, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f)
+    
+    # Move the previous export aside rather than overwriting it: workers that have
+    # its files memory-mapped keep reading the old inodes until they reload
+    retired_path = None
+    if os.path.exists(path):
+        retired_path = f"{path}.old-{int(time.time() * 1000)}"
+        os.rename(path, retired_path)
+    os.rename(staging_path, path)
+    if retired_path is not None:
+        shutil.rmtree(retired_path, ignore_errors=True)
+
+
+def export_flat_model(model, feature_columns, path=flat_model_path):
+    """Flatten the model, verify it against Pipeline.predict and save it to path"""
+    arrays, metadata = flatten_model(model, feature_columns)
+    flat_model = FlatForest(arrays, metadata)
+
+    max_error = check_parity(model, flat_model, sample_records(model, feature_columns, PARITY_ROWS))
+    if max_error != 0.0:
+        raise ValueError(f"Flat model does not match the Pipeline (max difference {max_error})")
+
+    write_flat_model(arrays, metadata, path)
+    print(f"Flat model saved to {path} ({metadata['n_trees']} trees, {metadata['n_nodes']} nodes)")
+    return flat_model
+
+
+if __name__ == "__main__":
+    export_flat_model(joblib.load(model_path), joblib.load(feature_columns_path))
@@ -0,0 +1,131 @@
+"""
+NumPy-only evaluator for the flattened crop price model.
+
+export_model.py flattens the fitted Pipeline (scaler statistics, one-hot
+category maps and the node arrays of every tree in the forest) into plain
+NumPy arrays. FlatForest loads those arrays and predicts single rows and
+batches without importing scikit-learn, matching Pipeline.predict exactly.
+
+The arrays are stored as one .npy file each in a model directory, so they can
+be opened with mmap_mode='r': every worker process then shares the same
+page-cache-backed copy of the forest instead of holding a private one.
+"""
+
+import json
+import os
+
+import numpy as np
+
+# Marker used by scikit-learn for the children of a leaf node
+TREE_LEAF = -1
+
+# Rows are scored in chunks to bound the size of the traversal arrays
+PREDICT_CHUNK_ROWS = 4096
+
+# Arrays stored in a flat model directory, one <name>.npy file each
+ARRAY_NAMES = ('mean', 'scale', 'roots', 'feature', 'threshold', 'children_left', 'children_right', 'value')
+METADATA_FILE = 'metadata.json'
+
+
+class FlatForest:
+    """Array-backed random forest regressor with its preprocessing"""
+
+    def __init__(self, arrays, metadata):
+        self.numeric_features = list(metadata['numeric_features'])
+        self.categorical_features = list(metadata['categorical_features'])
+        self.metadata = metadata
+
+        self.mean = arrays['mean']
+        self.scale = arrays['scale']
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children_left = arrays['children_left']
+        self.children_right = arrays['children_right']
+        self.value = arrays['value']
+
+        # Map every known category to its column in the encoded feature vector
+        self.category_offsets = []
+        offset = len(self.numeric_features)
+        for categories in metadata['categories']:
+            self.category_offsets.append({value: offset + i for i, value in enumerate(categories)})
+            offset += len(categories)
+        self.n_features = offset
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load a flat model directory written by export_model.export_flat_model.
+
+        With the default mmap_mode='r' the arrays are memory-mapped read-only
+        rather than copied into the process; pass None to load them into memory.
+        """
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+            for name in ARRAY_NAMES
+        }
+        return cls(arrays, metadata)
+
+    def encode(self, columns, n_rows):
+        """Scale and one-hot encode columnar input (column -> sequence) to float32"""
+        X = np.zeros((n_rows, self.n_features), dtype=np.float64)
+        for i, column in enumerate(self.numeric_features):
+            X[:, i] = (np.asarray(columns[column], dtype=np.float64) - self.mean[i]) / self.scale[i]
+        for offsets, column in zip(self.category_offsets, self.categorical_features):
+            # Unknown categories encode to all zeros (handle_unknown='ignore')
+            for row, value in enumerate(columns[column]):
+                position = offsets.get(value)
+                if position is not None:
+                    X[row, position] = 1.0
+        # The trees compare float32 features against float64 thresholds
+        return X.astype(np.float32)
+
+    def predict_encoded(self, X):
+        """Average the leaf values of every tree for encoded rows X"""
+        n_rows = X.shape[0]
+        n_trees = self.n_trees
+
+        # One traversal cursor per (tree, row) pair, tree-major
+        node = np.repeat(self.roots, n_rows)
+        row = np.tile(np.arange(n_rows), n_trees)
+        active = np.flatnonzero(self.children_left[node] != TREE_LEAF)
+        while active.size:
+            current = node[active]
+            go_left = X[row[active], self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.children_left[current], self.children_right[current])
+            node[active] = current
+            active = active[self.children_left[current] != TREE_LEAF]
+
+        # Accumulate tree by tree like RandomForestRegressor so results match exactly
+        leaf_values = self.value[node].reshape(n_trees, n_rows)
+        total = np.zeros(n_rows, dtype=np.float64)
+        for tree_values in leaf_values:
+            total += tree_values
+        total /= n_trees
+        return total
+
+    def predict(self, X):
+        """
+        Predict prices for columnar input.
+
+        X is anything indexable by column name (a pandas DataFrame or a dict of
+        sequences), so a FlatForest can stand in for the sklearn Pipeline.
+        """
+        columns = {column: list(X[column]) for column in self.numeric_features + self.categorical_features}
+        n_rows = len(next(iter(columns.values())))
+        predictions = np.empty(n_rows, dtype=np.float64)
+        for start in range(0, n_rows, PREDICT_CHUNK_ROWS):
+            stop = min(start + PREDICT_CHUNK_ROWS, n_rows)
+            chunk = {column: values[start:stop] for column, values in columns.items()}
+            predictions[start:stop] = self.predict_encoded(self.encode(chunk, stop - start))
+        return predictions
+
+    def predict_one(self, record):
+        """Predict the price for a single input record (column -> value)"""
+        return self.predict_encoded(self.encode({column: [value] for column, value in record.items()}, 1))[0]
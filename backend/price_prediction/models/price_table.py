@@ -0,0 +1,108 @@
+"""
+Precomputed price lookup table for the crop price model.
+
+build_price_table.py evaluates the model over every combination of the
+categorical inputs the model was trained on, at a grid of anchor points for
+each numeric input. PriceTable answers predictions from that table with
+multilinear interpolation between the anchors, in microseconds and without
+running the model. Inputs outside the grid (unknown categories or numeric
+values beyond the outer anchors) are reported as misses so the caller can fall
+back to the live model.
+"""
+
+import bisect
+import itertools
+import json
+
+import numpy as np
+
+
+class PriceTable:
+    """Indexed table of model predictions over the categorical x anchor grid"""
+
+    def __init__(self, values, anchors, metadata):
+        if any(len(axis) < 2 for axis in anchors):
+            raise ValueError("Every numeric feature needs at least 2 anchors to interpolate between")
+        self.values = values
+        self.anchors = anchors
+        self.metadata = metadata
+        self.numeric_features = list(metadata['numeric_features'])
+        self.categorical_features = list(metadata['categorical_features'])
+        self.model_versions = set(metadata['model_versions'])
+
+        # Category -> index maps and the mixed-radix strides of the combination index
+        self.category_indices = [{value: i for i, value in enumerate(categories)}
+                                 for categories in metadata['categories']]
+        sizes = [len(categories) for categories in metadata['categories']]
+        self.strides = [int(np.prod(sizes[i + 1:], dtype=np.int64)) for i in range(len(sizes))]
+
+        # Lookups run on plain Python floats: the anchor lists are tiny and a flat
+        # row per combination avoids NumPy indexing overhead on every corner
+        self.anchor_lists = [[float(anchor) for anchor in axis] for axis in anchors]
+        self.rows = values.reshape(values.shape[0], -1)
+        anchor_sizes = [len(axis) for axis in anchors]
+        cell_strides = [int(np.prod(anchor_sizes[i + 1:], dtype=np.int64)) for i in range(len(anchor_sizes))]
+        self.corners = [
+            (corner, sum(offset * stride for offset, stride in zip(corner, cell_strides)))
+            for corner in itertools.product((0, 1), repeat=len(self.numeric_features))
+        ]
+        self.cell_strides = cell_strides
+
+        self.lookups = 0
+        self.hits = 0
+
+    @classmethod
+    def load(cls, path):
+        """Load a table written by build_price_table.build_price_table"""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            values = data['values']
+            anchors = [data[f'anchors_{i}'] for i in range(len(metadata['numeric_features']))]
+        return cls(values, anchors, metadata)
+
+    def lookup(self, record):
+        """Interpolated price for an input record, or None if it is outside the grid"""
+        self.lookups += 1
+
+        combination = 0
+        for indices, stride, column in zip(self.category_indices, self.strides, self.categorical_features):
+            index = indices.get(record[column])
+            if index is None:
+                return None
+            combination += index * stride
+
+        # Locate every numeric value between two anchors
+        base = 0
+        weights = []
+        for anchors, stride, column in zip(self.anchor_lists, self.cell_strides, self.numeric_features):
+            value = float(record[column])
+            if not anchors[0] <= value <= anchors[-1]:
+                return None
+            i = min(bisect.bisect_right(anchors, value) - 1, len(anchors) - 2)
+            base += i * stride
+            weights.append((value - anchors[i]) / (anchors[i + 1] - anchors[i]))
+
+        # Multilinear interpolation over the surrounding 2^k anchor corners
+        row = self.rows[combination]
+        price = 0.0
+        for corner, offset in self.corners:
+            weight = 1.0
+            for upper, t in zip(corner, weights):
+                weight *= t if upper else 1.0 - t
+            if weight:
+                price += weight * float(row[base + offset])
+
+        self.hits += 1
+        return float(price)
+
+    def stats(self):
+        return {
+            "model_versions": sorted(self.model_versions),
+            "combinations": int(self.values.shape[0]),
+            "cells": int(self.values.size),
+            "anchors_per_feature": {column: len(anchors) for column, anchors in zip(self.numeric_features, self.anchors)},
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "fallbacks": self.lookups - self.hits,
+            "accuracy": self.metadata.get('accuracy')
+        }
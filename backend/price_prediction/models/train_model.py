@@ -1,53 +1,179 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from pandas.api.types import union_categoricals
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_absolute_error
+from contextlib import contextmanager
+import argparse
+import glob
 import joblib
 import os
+import sys
+import threading
+import time
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from price_prediction.models.export_model import export_flat_model
 
 # Set paths
 current_dir = os.path.dirname(os.path.abspath(__file__))
 data_dir = os.path.join(os.path.dirname(current_dir), 'data')
 model_dir = current_dir
 
-def train_model():
-    # Load the data - using the absolute path provided
-    data_path = "D:/Devanshu/Projects/Farmer Consumer website/crop_price_prediction_200_records.csv"
-    data = pd.read_csv(data_path)
+# Training data: a CSV path or a glob matching several CSVs with the same columns
+# (e.g. "data/apmc/*.csv"); can also be given on the command line
+TRAINING_DATA = os.environ.get(
+    "TRAINING_DATA", "D:/Devanshu/Projects/Farmer Consumer website/crop_price_prediction_200_records.csv"
+)
+
+# Rows parsed per CSV chunk; only one chunk of raw strings is held in memory at a time
+TRAINING_CHUNK_ROWS = int(os.environ.get("TRAINING_CHUNK_ROWS", "500000"))
+
+# Worker processes for fitting and cross-validation (-1 uses all cores)
+TRAINING_N_JOBS = int(os.environ.get("TRAINING_N_JOBS", "-1"))
+
+# Cross-validation folds run on the training split before the final fit (0 skips CV)
+TRAINING_CV_FOLDS = int(os.environ.get("TRAINING_CV_FOLDS", "5"))
+
+# Numeric columns are stored as float32: the forest trains on float32 anyway
+NUMERIC_DTYPE = 'float32'
+
+# Rows read to infer the column types before the full read
+SCHEMA_SAMPLE_ROWS = 10000
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Log wall time, peak memory and rows/sec for one training stage.
+
+    Peak memory is the highest resident set size of this process sampled while
+    the stage runs (worker processes used by n_jobs are not included). Yields a
+    dict whose 'rows' entry can be set inside the stage when it is not known up front.
+    """
+    info = {'rows': rows}
+    peak = [current_rss_bytes() or 0]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            peak[0] = max(peak[0], current_rss_bytes() or 0)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - start
+        done.set()
+        sampler.join()
+        message = f"[stage] {name}: {seconds:.2f}s"
+        if peak[0]:
+            message += f", peak RSS {peak[0] / 2**20:.1f} MB"
+        if info['rows']:
+            message += f", {info['rows'] / max(seconds, 1e-9):,.0f} rows/sec"
+        print(message)
+
+
+def data_files(data_path):
+    """Expand a CSV path or glob into a sorted list of files"""
+    paths = sorted(glob.glob(data_path)) if glob.has_magic(data_path) else [data_path]
+    if not paths:
+        raise FileNotFoundError(f"No training data matches {data_path}")
+    return paths
+
+
+def infer_dtypes(path):
+    """Explicit read dtypes from a sample: numeric columns as float32, everything else as strings"""
+    sample = pd.read_csv(path, nrows=SCHEMA_SAMPLE_ROWS)
+    return {
+        column: (NUMERIC_DTYPE if pd.api.types.is_numeric_dtype(dtype) else 'str')
+        for column, dtype in sample.dtypes.items()
+    }
+
+
+def read_training_data(paths, chunk_rows=TRAINING_CHUNK_ROWS):
+    """
+    Read one or more CSVs in typed chunks.
+
+    Each chunk's string columns are converted to categoricals straight away, so
+    the full dataset is held as float32 columns and small integer codes rather
+    than Python string objects. Chunks are combined with union_categoricals.
+    """
+    dtypes = infer_dtypes(paths[0])
+    categorical_columns = [column for column, dtype in dtypes.items() if dtype == 'str']
+    chunks = []
+    for path in paths:
+        for chunk in pd.read_csv(path, dtype=dtypes, chunksize=chunk_rows):
+            for column in categorical_columns:
+                chunk[column] = chunk[column].astype('category')
+            chunks.append(chunk)
+
+    data = {}
+    for column in dtypes:
+        if column in categorical_columns:
+            data[column] = pd.Series(union_categoricals([chunk[column] for chunk in chunks]))
+        else:
+            data[column] = pd.Series(np.concatenate([chunk[column].to_numpy() for chunk in chunks]))
+    return pd.DataFrame(data)
+
+
+def train_model(data_path=TRAINING_DATA, chunk_rows=TRAINING_CHUNK_ROWS, n_jobs=TRAINING_N_JOBS,
+                cv_folds=TRAINING_CV_FOLDS):
+    # Load the data in typed chunks from one file or a glob of files
+    paths = data_files(data_path)
+    print(f"Training data: {len(paths)} file(s) matching {data_path}")
+    with stage("load") as info:
+        data = read_training_data(paths, chunk_rows)
+        info['rows'] = len(data)
     
     # Display basic info
     print("Dataset shape:", data.shape)
     print("\nFirst few rows:")
     print(data.head())
     print("\nData Info:")
-    print(data.info())
+    data.info(memory_usage='deep')
     print("\nMissing values:")
     print(data.isnull().sum())
     
-    # Handle missing values if any
-    # For numeric columns, fill with median
-    numeric_cols = data.select_dtypes(include=['int64', 'float64']).columns
-    for col in numeric_cols:
-        if data[col].isnull().sum() > 0:
-            data[col].fillna(data[col].median(), inplace=True)
-    
-    # For categorical columns, fill with mode
-    categorical_cols = data.select_dtypes(include=['object']).columns
-    for col in categorical_cols:
-        if data[col].isnull().sum() > 0:
-            data[col].fillna(data[col].mode()[0], inplace=True)
-    
-    # Define features and target
-    X = data.drop('price', axis=1) if 'price' in data.columns else data.drop(data.columns[-1], axis=1)
-    y = data['price'] if 'price' in data.columns else data[data.columns[-1]]
+    with stage("preprocess", len(data)):
+        # Handle missing values if any
+        # For numeric columns, fill with median
+        numeric_cols = data.select_dtypes(include=['number']).columns
+        for col in numeric_cols:
+            if data[col].isnull().sum() > 0:
+                data[col] = data[col].fillna(data[col].median())
+        
+        # For categorical columns, fill with mode
+        categorical_cols = data.select_dtypes(include=['object', 'category']).columns
+        for col in categorical_cols:
+            if data[col].isnull().sum() > 0:
+                data[col] = data[col].fillna(data[col].mode()[0])
+        
+        # Define features and target
+        X = data.drop('price', axis=1) if 'price' in data.columns else data.drop(data.columns[-1], axis=1)
+        y = data['price'] if 'price' in data.columns else data[data.columns[-1]]
     
     # Identify numeric and categorical columns
-    numeric_features = X.select_dtypes(include=['int64', 'float64']).columns.tolist()
-    categorical_features = X.select_dtypes(include=['object']).columns.tolist()
+    numeric_features = X.select_dtypes(include=['number']).columns.tolist()
+    categorical_features = X.select_dtypes(include=['object', 'category']).columns.tolist()
     
     # Print features info
     print(f"\nNumeric features: {numeric_features}")
@@ -72,19 +198,31 @@ def train_model():
     # Create the model pipeline
     model = Pipeline(steps=[
         ('preprocessor', preprocessor),
-        ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
+        ('regressor', RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs))
     ])
     
     # Split the data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
+    # Cross-validate with the folds in parallel; each fold's forest is single-threaded
+    # so the folds do not oversubscribe the cores
+    if cv_folds > 1:
+        print(f"\nCross-validating ({cv_folds} folds)...")
+        with stage("cross-validation", len(X_train) * cv_folds):
+            cv_model = clone(model).set_params(regressor__n_jobs=1)
+            scores = -cross_val_score(cv_model, X_train, y_train, cv=cv_folds,
+                                      scoring='neg_mean_absolute_error', n_jobs=n_jobs)
+        print(f"Cross-validation MAE: {scores.mean():.2f} (+/- {scores.std():.2f})")
+    
     # Train the model
     print("\nTraining the model...")
-    model.fit(X_train, y_train)
+    with stage("fit", len(X_train)):
+        model.fit(X_train, y_train)
     
     # Evaluate the model
-    y_pred = model.predict(X_test)
-    mae = mean_absolute_error(y_test, y_pred)
+    with stage("evaluate", len(X_test)):
+        y_pred = model.predict(X_test)
+        mae = mean_absolute_error(y_test, y_pred)
     print(f"\nModel Evaluation:")
     print(f"Mean Absolute Error: {mae:.2f}")
     
@@ -104,22 +242,40 @@ def train_model():
         except:
             print(f"Error printing feature {i}")
     
-    # Save the model
-    model_path = os.path.join(model_dir, 'crop_price_model.joblib')
-    joblib.dump(model, model_path)
-    print(f"\nModel saved to {model_path}")
+    # Worker processes are no longer needed once the model is fitted
+    model.set_params(regressor__n_jobs=None)
     
-    # Save feature column names for inference
-    feature_columns = {
-        'numeric_features': numeric_features,
-        'categorical_features': categorical_features
-    }
+    with stage("save"):
+        # Save the model
+        model_path = os.path.join(model_dir, 'crop_price_model.joblib')
+        joblib.dump(model, model_path)
+        print(f"\nModel saved to {model_path}")
+        
+        # Save feature column names for inference
+        feature_columns = {
+            'numeric_features': numeric_features,
+            'categorical_features': categorical_features
+        }
+        
+        feature_columns_path = os.path.join(model_dir, 'feature_columns.joblib')
+        joblib.dump(feature_columns, feature_columns_path)
+        print(f"Feature columns saved to {feature_columns_path}")
     
-    feature_columns_path = os.path.join(model_dir, 'feature_columns.joblib')
-    joblib.dump(feature_columns, feature_columns_path)
-    print(f"Feature columns saved to {feature_columns_path}")
+    # Export the flat, sklearn-free copy of the model used by the "flat" engine
+    with stage("export"):
+        export_flat_model(model, feature_columns, os.path.join(model_dir, 'crop_price_model_flat'))
     
     return model, mae
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the crop price prediction model")
+    parser.add_argument('data', nargs='?', default=TRAINING_DATA, help="CSV path or glob (default: $TRAINING_DATA)")
+    parser.add_argument('--chunk-rows', type=int, default=TRAINING_CHUNK_ROWS, help="Rows parsed per CSV chunk")
+    parser.add_argument('--n-jobs', type=int, default=TRAINING_N_JOBS, help="Worker processes (-1 for all cores)")
+    parser.add_argument('--cv-folds', type=int, default=TRAINING_CV_FOLDS, help="Cross-validation folds (0 to skip)")
+    args = parser.parse_args(argv)
+    return train_model(args.data, args.chunk_rows, args.n_jobs, args.cv_folds)
+
 if __name__ == "__main__":
-    train_model() 
\ No newline at end of file
+    main()
@@ -4,7 +4,6 @@ Run this script after starting the server to test various API endpoints
 """
 
 import requests
-import json
 import uuid
 
 # Base URL
@@ -20,9 +19,19 @@ def test_farmer_dashboard():
     """Test the farmer dashboard endpoints"""
     print("===== TESTING FARMER DASHBOARD =====")
     
-    # Get all crops
-    response = requests.get(f"{BASE_URL}/farmer")
-    print("All crops:", response.json()[:2])  # Show just the first 2 crops
+    # Get the first page of crops
+    response = requests.get(f"{BASE_URL}/farmer", params={"limit": 2})
+    page = response.json()
+    print("Crops:", page["items"])
+    
+    # Get the next page
+    if page["next_cursor"]:
+        response = requests.get(f"{BASE_URL}/farmer", params={"limit": 2, "cursor": page["next_cursor"]})
+        print("Next crops:", response.json()["items"])
+    
+    # Filter crops
+    response = requests.get(f"{BASE_URL}/farmer", params={"location": "Maharashtra", "max_price": 30})
+    print("Crops in Maharashtra up to 30/unit:", response.json()["items"])
     
     # Add a new crop
     new_crop = {
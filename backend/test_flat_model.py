@@ -0,0 +1,98 @@
+"""
+Test that the flat price model predicts what the sklearn Pipeline predicts.
+
+Fits a small Pipeline with the same layout as train_model() on generated data,
+exports it with export_model.flatten_model(), and compares FlatForest (in
+memory and memory-mapped from disk) and FastRowPredictor with Pipeline.predict.
+Needs no running server or trained model:
+
+    python -m pytest test_flat_model.py   (or python test_flat_model.py)
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from price_prediction.api.fast_inference import FastRowPredictor
+from price_prediction.models.export_model import flatten_model, sample_records, write_flat_model
+from price_prediction.models.flat_forest import FlatForest
+
+FEATURE_COLUMNS = {
+    'numeric_features': ['Year', 'Min Price (Rs/Qtl)', 'Max Price (Rs/Qtl)'],
+    'categorical_features': ['Category', 'Crop Name', 'Center/State'],
+}
+
+# Largest relative difference accepted between the Pipeline and the flat model
+TOLERANCE = 1e-9
+
+def fit_model(n=500, seed=0):
+    """A small Pipeline(ColumnTransformer(StandardScaler, OneHotEncoder) -> RandomForestRegressor)"""
+    rng = np.random.default_rng(seed)
+    min_price = rng.uniform(500, 5000, n).round(2)
+    X = pd.DataFrame({
+        'Year': rng.integers(2015, 2025, n),
+        'Min Price (Rs/Qtl)': min_price,
+        'Max Price (Rs/Qtl)': (min_price + rng.uniform(0, 1500, n)).round(2),
+        'Category': rng.choice(['Cereal', 'Vegetable', 'Pulse'], n),
+        'Crop Name': rng.choice(['Rice', 'Wheat', 'Onion', 'Potato', 'Lentil'], n),
+        'Center/State': rng.choice(['Punjab', 'Haryana', 'Maharashtra'], n),
+    })
+    y = (X['Min Price (Rs/Qtl)'] + X['Max Price (Rs/Qtl)']) / 2 + rng.normal(0, 50, n)
+
+    preprocessor = ColumnTransformer(transformers=[
+        ('num', Pipeline(steps=[('scaler', StandardScaler())]), FEATURE_COLUMNS['numeric_features']),
+        ('cat', Pipeline(steps=[('onehot', OneHotEncoder(handle_unknown='ignore'))]),
+         FEATURE_COLUMNS['categorical_features'])
+    ])
+    model = Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('regressor', RandomForestRegressor(n_estimators=10, max_depth=8, random_state=42))
+    ])
+    return model.fit(X, y)
+
+def parity_records(model):
+    """Generated records, plus one with categories the model has never seen"""
+    records = sample_records(model, FEATURE_COLUMNS, 200)
+    records.append({**records[0], 'Crop Name': 'Saffron', 'Center/State': 'Kerala'})
+    return records
+
+def test_flat_forest_matches_pipeline():
+    """FlatForest.predict and predict_one match Pipeline.predict"""
+    model = fit_model()
+    flat_model = FlatForest(*flatten_model(model, FEATURE_COLUMNS))
+    records = parity_records(model)
+    expected = model.predict(pd.DataFrame(records))
+
+    np.testing.assert_allclose(flat_model.predict(pd.DataFrame(records)), expected, rtol=TOLERANCE)
+    np.testing.assert_allclose([flat_model.predict_one(record) for record in records], expected, rtol=TOLERANCE)
+
+def test_saved_flat_forest_matches_pipeline():
+    """A flat model written to disk and memory-mapped back predicts the same"""
+    model = fit_model()
+    records = parity_records(model)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'crop_price_model_flat')
+        write_flat_model(*flatten_model(model, FEATURE_COLUMNS), path)
+        flat_model = FlatForest.load(path)
+        np.testing.assert_allclose(flat_model.predict(pd.DataFrame(records)),
+                                   model.predict(pd.DataFrame(records)), rtol=TOLERANCE)
+
+def test_fast_row_predictor_matches_pipeline():
+    """FastRowPredictor.predict_one matches Pipeline.predict row by row"""
+    model = fit_model()
+    predictor = FastRowPredictor(model, FEATURE_COLUMNS)
+    records = parity_records(model)
+    np.testing.assert_allclose([predictor.predict_one(record) for record in records],
+                               model.predict(pd.DataFrame(records)), rtol=TOLERANCE)
+
+if __name__ == "__main__":
+    test_flat_forest_matches_pipeline()
+    test_saved_flat_forest_matches_pipeline()
+    test_fast_row_predictor_matches_pipeline()
+    print("Flat model and fast row predictor match the Pipeline")
@@ -0,0 +1,41 @@
+"""
+Test that the farmer.db queries use their indexes.
+
+Builds a small farmer.db with setup_db() in a temporary directory and checks
+the EXPLAIN QUERY PLAN of every listing, marketplace and stats query listed
+in benchmarks/bench_crop_queries.py. Needs no running server:
+
+    python -m pytest test_query_plans.py   (or python test_query_plans.py)
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from bench_crop_queries import QUERIES, query_plan
+from farmer.dashboard_api import setup_db
+
+def test_query_plans_use_indexes():
+    """Every query plan reads through its index, without a table scan or an extra sort"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "farmer.db")
+        setup_db(path)
+        conn = sqlite3.connect(path)
+        try:
+            for label, query, params, expected, forbidden in QUERIES:
+                plan = query_plan(conn, query, params)
+                assert any("USING INDEX" in line or "USING COVERING INDEX" in line for line in plan), (label, plan)
+                for fragment in expected:
+                    assert any(fragment in line for line in plan), (label, f"expected '{fragment}'", plan)
+                for fragment in forbidden:
+                    assert not any(fragment in line for line in plan), (label, f"unexpected '{fragment}'", plan)
+                print(f"{label}: {' | '.join(plan)}")
+        finally:
+            conn.close()
+
+if __name__ == "__main__":
+    test_query_plans_use_indexes()
+    print("All query plans use their indexes")
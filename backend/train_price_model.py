@@ -11,10 +11,10 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import the training function
-from price_prediction.models.train_model import train_model
+from price_prediction.models.train_model import main as train_main
 
 if __name__ == "__main__":
     print("Training crop price prediction model...")
-    model, mae = train_model()
+    model, mae = train_main()
     print(f"Model training completed with MAE: {mae:.2f}")
     print("You can now start the API with: python main.py") 
\ No newline at end of file
@@ -0,0 +1,19 @@
+"""
+Percentile summaries of recent latency samples for the /stats endpoints.
+
+The worker pools and the micro-batcher each keep a bounded deque of recent
+wait times in milliseconds; latency_summary() turns one into the p50/p99/max
+block they report.
+"""
+
+import numpy as np
+
+
+def latency_summary(samples_ms):
+    """p50, p99 and max of the samples in ms, rounded for display (all 0 without samples)"""
+    samples = np.array(samples_ms) if samples_ms else np.zeros(1)
+    return {
+        "p50": round(float(np.percentile(samples, 50)), 3),
+        "p99": round(float(np.percentile(samples, 99)), 3),
+        "max": round(float(samples.max()), 3)
+    }
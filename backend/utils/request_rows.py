@@ -0,0 +1,79 @@
+"""
+Parsing and validation of multi-row request bodies.
+
+/predict/batch and /farmer/bulk accept a JSON array of objects or, with an
+NDJSON content type, one object per line. Rows are validated one by one so a
+bad row is reported in its own result entry instead of failing the request.
+"""
+
+import json
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+
+# Content types that are parsed as newline-delimited JSON
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """Flatten a pydantic ValidationError into a single readable line"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+async def read_rows(request: Request, max_rows: int, what: str = "rows"):
+    """
+    Read the raw rows of a JSON array or NDJSON body.
+
+    NDJSON lines that are not valid JSON become ValueError entries, so they
+    are reported as row errors. A malformed JSON body is a 400, and more than
+    max_rows rows a 413; what names the rows in those messages.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        raw_rows = []
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                raw_rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raw_rows.append(ValueError(f"Invalid JSON: {e.msg}"))
+    else:
+        try:
+            raw_rows = json.loads(body) if body else []
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {e.msg}")
+        if not isinstance(raw_rows, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Request body must be a JSON array of {what}")
+
+    if len(raw_rows) > max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many {what}: {len(raw_rows)} (maximum is {max_rows})"
+        )
+    return raw_rows
+
+
+def validate_rows(raw_rows, model):
+    """
+    Validate every raw row against a pydantic model.
+
+    Returns (results, valid): results has an error entry for every invalid
+    row (None for the others) and valid is a list of (index, model instance).
+    """
+    results = [None] * len(raw_rows)
+    valid = []
+    for index, raw_row in enumerate(raw_rows):
+        if isinstance(raw_row, Exception):
+            results[index] = {"index": index, "error": str(raw_row)}
+            continue
+        try:
+            valid.append((index, model.model_validate(raw_row)))
+        except ValidationError as e:
+            results[index] = {"index": index, "error": format_validation_error(e)}
+    return results, valid